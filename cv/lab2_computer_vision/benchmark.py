@@ -0,0 +1,155 @@
+import argparse
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+from geometry import Diamond2D, Parallelepiped3D, Transform2D, Transform3D
+from level1_2d_diamond import build_animation
+from level3_combined import CombinedAnimationGIF
+
+
+def copying_step(shape, matrices):
+    """Старий шлях: reset() копіює оригінал, а (M @ P.T).T створює новий масив."""
+    def step(frame):
+        shape.points = shape.original_points.copy()
+        shape.points = (matrices[frame] @ shape.points.T).T
+    return step
+
+
+def inplace_step(shape, matrices):
+    """Новий шлях: вершини кадру пишуться з оригіналу прямо в готовий буфер."""
+    def step(frame):
+        Transform2D.apply_transform(shape.original_points, matrices[frame], out=shape.points)
+    return step
+
+
+class PointCloud:
+    """Хмара з n однорідних 3D точок — показує, як алокації ростуть з розміром геометрії."""
+
+    def __init__(self, n, rng):
+        self.original_points = np.ones((n, 4))
+        self.original_points[:, :3] = rng.uniform(-1, 1, (n, 3))
+        self.points = self.original_points.copy()
+
+
+def scenarios(frames, points):
+    diamond = Diamond2D(center=(0, 0), width=3, height=4)
+    frame_ids = np.arange(frames)
+    diamond_track = Transform2D.compose(
+        Transform2D.translation_matrix(8 * np.cos(frame_ids * 0.15), 8 * np.sin(frame_ids * 0.15)),
+        Transform2D.rotation_matrix(frame_ids * 0.08),
+    )
+
+    # Parallelepiped3D зберігає вершини у vertices; для спільних кроків даємо їм ім'я points
+    box = Parallelepiped3D(center=(0, 0, 0), width=2, height=3, depth=1.5)
+    box.original_points, box.points = box.original_vertices, box.vertices
+    angles = frame_ids * 0.05
+    rotations = Transform3D.euler_rotation(angles, angles * 0.7, angles * 0.5)
+
+    cloud = PointCloud(points, np.random.default_rng(0))
+    return [
+        ('ромб 2D', diamond, diamond_track),
+        ('паралелепіпед', box, rotations),
+        (f'хмара {points}', cloud, rotations),
+    ]
+
+
+def measure(step, frames):
+    """
+    Час кадру, середній пік тимчасової пам'яті за кадр і приріст пам'яті за
+    другу половину циклу (за tracemalloc) — сталий режим, коли кеші numpy вже
+    заповнені. Перші кадри — прогрів, вони не рахуються.
+    """
+    frame_ids = list(range(frames))
+    for frame in frame_ids[:10]:
+        step(frame)
+
+    tracemalloc.start()
+    transient = 0
+    for frame in frame_ids:
+        current = tracemalloc.get_traced_memory()[0]
+        if frame == frames // 2:
+            before = current
+        tracemalloc.reset_peak()
+        step(frame)
+        transient += tracemalloc.get_traced_memory()[1] - current
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for frame in frame_ids:
+        step(frame)
+    elapsed = time.perf_counter() - start
+    return elapsed / frames, transient / frames, retained
+
+
+def bench_geometry(frames, points):
+    """
+    Кадровий цикл геометрії: копіювання на кожному кадрі проти запису в буфер
+    через out=. Від результатів віднімається порожній крок, тож лишаються лише
+    алокації самого кроку. Для out= це заголовки view (matrices[frame], M.T) —
+    кілька сотень байт, які не залежать від кількості точок: масивів даних
+    у сталому режимі не виділяється жодного.
+    """
+    _, empty_transient, empty_retained = measure(lambda frame: None, frames)
+    print(f"Геометрія кадру, {frames} кадрів")
+    print(f"{'сцена':>15} {'шлях':>6} {'мкс/кадр':>9} {'Б/кадр':>10} {'приріст Б':>10} {'збіг':>5}")
+    for name, shape, matrices in scenarios(frames, points):
+        results = {}
+        for label, make_step in (('копія', copying_step), ('out=', inplace_step)):
+            shape.points = shape.original_points.copy()
+            step = make_step(shape, matrices)
+            seconds, transient, retained = measure(step, frames)
+            step(frames - 1)
+            results[label] = shape.points
+            same = '-' if label == 'копія' else str(np.array_equal(results['копія'], results[label]))
+            print(f"{name:>15} {label:>6} {seconds * 1e6:>9.1f} {transient - empty_transient:>10.0f} "
+                  f"{retained - empty_retained:>10} {same:>5}")
+
+
+def bench_update(frames, dpi):
+    """
+    Повний кадр анімації — update рівня, а не лише трансформація. Вершини,
+    контур і центр пишуться в буфери, виділені один раз, тож масивів даних
+    наш код кадру не створює; на рівні I лишаються заголовки view і рядок
+    заголовка (~1 КБ, не залежить від геометрії). На рівні III основна частина
+    Б/кадр — matplotlib: ax.clear() і повторне налаштування осей, текст,
+    нові артисти; приріст там — кеші розкладки тексту matplotlib, що
+    заповнюються новими підписами. Логи кадрів вимкнено, щоб не міряти їх.
+    """
+    print(f"\nПовний update кадру, {frames} кадрів, dpi {dpi}")
+    print(f"{'рівень':>22} {'мс/кадр':>8} {'Б/кадр':>10} {'приріст Б':>10}")
+    _, empty_transient, empty_retained = measure(lambda frame: None, frames)
+
+    logging.disable(logging.INFO)
+    fig, update, _ = build_animation(frames, dpi)
+    cases = [('I', update, fig)]
+    for backend in ('software', 'matplotlib'):
+        anim = CombinedAnimationGIF(backend=backend, dpi=dpi)
+        cases.append((f'III ({backend})', anim.update, anim.fig))
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        results = [(name, measure(step, frames)) for name, step, _ in cases]
+    logging.disable(logging.NOTSET)
+    for name, (seconds, transient, retained) in results:
+        print(f"{name:>22} {seconds * 1e3:>8.2f} {transient - empty_transient:>10.0f} {retained - empty_retained:>10}")
+    for _, _, figure in cases:
+        plt.close(figure)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк алокацій геометрії lab2")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--points", type=int, default=100000, help="розмір хмари точок")
+    parser.add_argument("--update-frames", type=int, default=60, help="кадрів для повного update")
+    parser.add_argument("--dpi", type=int, default=50, help="роздільність фігур для повного update")
+    args = parser.parse_args()
+
+    bench_geometry(args.frames, args.points)
+    bench_update(args.update_frames, args.dpi)
@@ -0,0 +1,308 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+
+def build_palette(frame, extra_colors=None):
+    """
+    Глобальна палітра GIF (зображення в режимі 'P') з кадру RGB(A). Кольори з
+    extra_colors, яких ще немає в першому кадрі (напр. кольори, що з'являться
+    пізніше), резервуються в палітрі окремо, щоб медіанний поділ їх не загубив.
+    """
+    image = _to_rgb(frame)
+    extra = np.asarray([] if extra_colors is None else extra_colors, dtype=np.uint8).reshape(-1, 3)
+    quantized = image.quantize(256 - len(extra))
+    colors = quantized.getpalette()[:3 * (256 - len(extra))] + extra.reshape(-1).tolist()
+    palette = Image.new('P', (1, 1))
+    palette.putpalette(colors + [0] * (768 - len(colors)))
+    return palette
+
+
+def _to_rgb(frame):
+    if isinstance(frame, Image.Image):
+        return frame.convert('RGB')
+    frame = np.asarray(frame)
+    if frame.shape[2] == 4:
+        # Без проміжного масиву: Pillow читає буфер RGBA напряму і сам відкидає альфу
+        return Image.frombuffer('RGBA', (frame.shape[1], frame.shape[0]), frame, 'raw', 'RGBA', 0, 1).convert('RGB')
+    return Image.fromarray(frame)
+
+
+def _to_rgba(frame):
+    """Власна копія кадру як (h, w, 4) uint8 — формат буфера Agg, зручний для 32-бітного перегляду."""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert('RGBA'))
+    frame = np.asarray(frame)
+    if frame.shape[2] == 4:
+        return np.array(frame, dtype=np.uint8, order='C')
+    rgba = np.empty(frame.shape[:2] + (4,), dtype=np.uint8)
+    rgba[..., :3] = frame
+    rgba[..., 3] = 255
+    return rgba
+
+
+class FrameEncoder:
+    """
+    Потоковий запис кадрів у '.gif' (одна глобальна палітра на весь файл) або
+    '.mp4' (потрібен imageio-ffmpeg). Квантування і кодування виконуються у
+    фоновому потоці, поки рендериться наступний кадр; черга обмежена queue_size
+    кадрами, тож пам'ять не росте з довжиною анімації.
+    """
+
+    def __init__(self, path, fps=20, palette=None, extra_colors=None, queue_size=4):
+        self.path = path
+        self.fps = fps
+        self.kind = {'.gif': 'gif', '.mp4': 'mp4'}.get(os.path.splitext(path)[1].lower())
+        if self.kind is None:
+            raise ValueError(f"Непідтримуваний формат: {path}")
+        self.palette = palette
+        self.extra_colors = extra_colors
+        self.frames_written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        """
+        Кадр (h, w, 3|4) uint8 або зображення Pillow. Буфер (напр. buffer_rgba()
+        полотна) одразу копіюється, тож його можна перемальовувати далі.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(_to_rgba(frame))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        handle = None
+        try:
+            while (frame := self._queue.get()) is not None:
+                if handle is None:
+                    handle = self._open(frame)
+                self._encode(handle, frame)
+                self.frames_written += 1
+        except Exception as e:
+            self._error = e
+            # Продовжуємо вичитувати чергу, щоб write() не завис на мертвому потоці
+            while self._queue.get() is not None:
+                pass
+        finally:
+            if handle is not None:
+                self._finish(handle)
+
+    def _open(self, frame):
+        if self.kind == 'mp4':
+            import imageio.v2 as imageio
+            return imageio.get_writer(self.path, fps=self.fps, macro_block_size=1)
+        if self.palette is None:
+            self.palette = build_palette(frame, self.extra_colors)
+        self._colors = np.asarray(self.palette.getpalette()[:768], dtype=np.int32).reshape(-1, 3)
+        # Індекс палітри для кожного з 2^24 кольорів; 256 — ще не обчислено
+        self._lut = np.full(1 << 24, 256, dtype=np.uint16)
+        self._previous = None
+        handle = open(self.path, 'wb')
+        header, _ = GifImagePlugin.getheader(self._to_indexed(self._quantize(frame)), info={'loop': 0})
+        handle.writelines(header)
+        return handle
+
+    def _encode(self, handle, frame):
+        if self.kind == 'mp4':
+            handle.append_data(frame[..., :3])
+            return
+        indices = self._quantize(frame)
+        x0, y0 = 0, 0
+        if self._previous is not None:
+            # Як і Pillow, пишемо лише прямокутник змін відносно попереднього кадру
+            changed = indices != self._previous
+            rows, cols = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if not rows.size:
+                rows = cols = np.zeros(1, dtype=np.intp)
+            y0, x0 = rows[0], cols[0]
+            self._previous = indices
+            indices = indices[y0:rows[-1] + 1, x0:cols[-1] + 1]
+        else:
+            self._previous = indices
+        handle.writelines(GifImagePlugin.getdata(self._to_indexed(indices), offset=(int(x0), int(y0)),
+                                                 duration=int(1000 / self.fps)))
+
+    def _finish(self, handle):
+        if self.kind == 'gif':
+            handle.write(b';')
+        handle.close()
+
+    def _quantize(self, frame):
+        """
+        Точне найближче відображення на глобальну палітру. Таблиця на 2^24 кольорів
+        заповнюється ліниво, тож після перших кадрів це лише один gather на піксель.
+        """
+        # Піксель RGBA як little-endian uint32: R | G << 8 | B << 16, альфа відкидається
+        codes = frame.view('<u4')[..., 0] & 0xFFFFFF
+        indices = self._lut[codes]
+        missing = indices == 256
+        if missing.any():
+            new = np.unique(codes[missing])
+            for start in range(0, len(new), 4096):
+                chunk = new[start:start + 4096]
+                colors = np.stack([chunk & 255, (chunk >> 8) & 255, chunk >> 16], axis=1).astype(np.int32)
+                distance = ((colors[:, None, :] - self._colors[None]) ** 2).sum(axis=2)
+                self._lut[chunk] = distance.argmin(axis=1)
+            indices = self._lut[codes]
+        return indices.astype(np.uint8)
+
+    def _to_indexed(self, indices):
+        indices = np.ascontiguousarray(indices)
+        image = Image.frombuffer('P', (indices.shape[1], indices.shape[0]), indices, 'raw', 'P', 0, 1)
+        image.putpalette(self._colors.astype(np.uint8).tobytes())
+        return image
+
+
+def export_animation(fig, update, frames, path, fps=20, draw=None, palette_frames=(), **encoder_options):
+    """
+    Замість FuncAnimation.save: update(frame) оновлює фігуру, draw() малює її на
+    полотні Agg (за замовчуванням fig.canvas.draw, можна передати blit-рендер),
+    а buffer_rgba() без копіювання йде у FrameEncoder. Якщо задано palette_frames,
+    глобальна палітра будується з цих кадрів заздалегідь (лише коли update не
+    має стану між кадрами).
+    """
+    draw = draw or fig.canvas.draw
+    if palette_frames:
+        samples = []
+        for frame in palette_frames:
+            update(frame)
+            draw()
+            samples.append(np.array(fig.canvas.buffer_rgba()))
+        encoder_options['palette'] = build_palette(np.concatenate(samples))
+
+    with FrameEncoder(path, fps=fps, **encoder_options) as encoder:
+        for frame in frames:
+            update(frame)
+            draw()
+            encoder.write(np.asarray(fig.canvas.buffer_rgba()))
+    return encoder.frames_written
+
+
+def export_chunked(render, frame_count, path, chunk_size=50, fps=20, work_dir=None, params=None,
+                   extra_colors=None):
+    """
+    Експорт із контрольними точками. render(frame) повертає кадр (h, w, 3|4) і має
+    бути чистою функцією номера кадру. Кадри пишуться сегментами по chunk_size у
+    work_dir (за замовчуванням '<path>.parts') разом із manifest.json; повторний
+    запуск з тими самими параметрами пропускає готові сегменти. Наприкінці сегменти
+    склеюються в path без перекодування, а work_dir видаляється.
+    params — JSON-словник усього, від чого залежать кадри (seed, dpi, ...): якщо він
+    змінився, старі сегменти не використовуються.
+    """
+    work_dir = work_dir or f"{path}.parts"
+    ext = os.path.splitext(path)[1].lower()
+    manifest_path = os.path.join(work_dir, 'manifest.json')
+    manifest = {'frames': frame_count, 'chunk_size': chunk_size, 'fps': fps,
+                'params': json.loads(json.dumps(params or {})), 'palette': None, 'segments': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            saved = json.load(f)
+        if all(saved.get(key) == manifest[key] for key in ('frames', 'chunk_size', 'fps', 'params')):
+            manifest = saved
+    os.makedirs(work_dir, exist_ok=True)
+
+    palette = None
+    if ext == '.gif':
+        # Одна палітра на всі сегменти — лише тоді їхні кадри можна склеїти байт у байт
+        if manifest['palette'] is None:
+            manifest['palette'] = build_palette(render(0), extra_colors).getpalette()[:768]
+            _write_manifest(manifest_path, manifest)
+        palette = Image.new('P', (1, 1))
+        palette.putpalette(manifest['palette'])
+
+    segments = []
+    for index, start in enumerate(range(0, frame_count, chunk_size)):
+        stop = min(start + chunk_size, frame_count)
+        name = f"segment_{index:04d}{ext}"
+        segment_path = os.path.join(work_dir, name)
+        segments.append(segment_path)
+        if manifest['segments'].get(name) == [start, stop] and os.path.exists(segment_path):
+            continue
+
+        # Пишемо під тимчасовим ім'ям і перейменовуємо: обірваний сегмент не виглядає готовим
+        tmp_path = os.path.join(work_dir, f"{name}.tmp{ext}")
+        with FrameEncoder(tmp_path, fps=fps, palette=palette) as encoder:
+            for frame in range(start, stop):
+                encoder.write(render(frame))
+        os.replace(tmp_path, segment_path)
+        manifest['segments'][name] = [start, stop]
+        _write_manifest(manifest_path, manifest)
+
+    concat_segments(segments, path)
+    shutil.rmtree(work_dir)
+    return frame_count
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def concat_segments(segments, path):
+    """
+    Склеює сегменти без перекодування. GIF зі спільною палітрою: заголовок
+    першого сегмента, кадри всіх сегментів підряд і один термінатор. MP4: concat
+    demuxer ffmpeg з копіюванням потоку (ffmpeg з imageio-ffmpeg).
+    """
+    if os.path.splitext(path)[1].lower() == '.mp4':
+        import imageio_ffmpeg
+        list_path = f"{path}.segments.txt"
+        with open(list_path, 'w') as f:
+            f.writelines(f"file '{os.path.abspath(segment)}'\n" for segment in segments)
+        try:
+            subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-f', 'concat',
+                            '-safe', '0', '-i', list_path, '-c', 'copy', path], check=True)
+        finally:
+            os.remove(list_path)
+        return
+
+    header = None
+    with open(path, 'wb') as out:
+        for segment in segments:
+            with open(segment, 'rb') as f:
+                data = f.read()
+            size = _gif_header_size(data)
+            if header is None:
+                header = data[:size]
+                out.write(header)
+            elif data[:size] != header:
+                raise ValueError(f"Сегмент {segment} має інший заголовок або палітру")
+            # Без заголовка і завершального ';'
+            out.write(data[size:-1])
+        out.write(b';')
+
+
+def _gif_header_size(data):
+    """Довжина заголовка GIF: підпис, дескриптор екрана, глобальна палітра і розширення до першого кадру."""
+    flags = data[10]
+    pos = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    # Розширення застосунку (NETSCAPE loop) і коментарі належать заголовку; кадр
+    # починається з розширення керування графікою (0xF9) або дескриптора зображення
+    while data[pos] == 0x21 and data[pos + 1] != 0xF9:
+        pos += 2
+        while data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+    return pos
@@ -0,0 +1,262 @@
+import numpy as np
+
+
+class Transform2D:
+    """
+    Однорідні 3x3 матриці. Конструктори приймають скаляри або масиви параметрів
+    довжини F і тоді повертають стек (F, 3, 3) — по матриці на кадр.
+    """
+    @staticmethod
+    def _identity(*params):
+        params = np.broadcast_arrays(*[np.asarray(p, dtype=np.float64) for p in params])
+        matrix = np.zeros(params[0].shape + (3, 3))
+        matrix[..., 0, 0] = matrix[..., 1, 1] = matrix[..., 2, 2] = 1
+        return matrix, params
+
+    @staticmethod
+    def translation_matrix(dx, dy):
+        matrix, (dx, dy) = Transform2D._identity(dx, dy)
+        matrix[..., 0, 2] = dx
+        matrix[..., 1, 2] = dy
+        return matrix
+
+    @staticmethod
+    def rotation_matrix(angle):
+        matrix, (angle,) = Transform2D._identity(angle)
+        cos_a, sin_a = np.cos(angle), np.sin(angle)
+        matrix[..., 0, 0], matrix[..., 0, 1] = cos_a, -sin_a
+        matrix[..., 1, 0], matrix[..., 1, 1] = sin_a, cos_a
+        return matrix
+
+    @staticmethod
+    def scaling_matrix(sx, sy):
+        matrix, (sx, sy) = Transform2D._identity(sx, sy)
+        matrix[..., 0, 0] = sx
+        matrix[..., 1, 1] = sy
+        return matrix
+
+    @staticmethod
+    def about_point(matrix, center):
+        """Та сама трансформація відносно точки center (або (F, 2) центрів)."""
+        center = np.asarray(center, dtype=np.float64)
+        T_to_origin = Transform2D.translation_matrix(-center[..., 0], -center[..., 1])
+        T_back = Transform2D.translation_matrix(center[..., 0], center[..., 1])
+        return T_back @ matrix @ T_to_origin
+
+    @staticmethod
+    def compose(*matrices):
+        """Зливає ланцюжок в одну матрицю; матриці задаються в порядку застосування."""
+        return _compose(matrices)
+
+    @staticmethod
+    def apply_transform(points, matrix, out=None):
+        """(N, 3) точки; для стеку (F, 3, 3) повертає (F, N, 3) одним einsum."""
+        return _apply(points, matrix, out)
+
+
+class Transform3D:
+    """
+    Однорідні 4x4 матриці. Кут може бути скаляром або масивом довжини F —
+    тоді конструктори повертають стек (F, 4, 4), по матриці на кадр.
+    """
+    @staticmethod
+    def _rotation(angle, i, j):
+        angle = np.asarray(angle, dtype=np.float64)
+        c, s = np.cos(angle), np.sin(angle)
+        matrix = np.zeros(angle.shape + (4, 4))
+        matrix[..., 0, 0] = matrix[..., 1, 1] = matrix[..., 2, 2] = matrix[..., 3, 3] = 1
+        matrix[..., i, i], matrix[..., i, j] = c, -s
+        matrix[..., j, i], matrix[..., j, j] = s, c
+        return matrix
+
+    @staticmethod
+    def rotation_x(angle):
+        return Transform3D._rotation(angle, 1, 2)
+
+    @staticmethod
+    def rotation_y(angle):
+        return Transform3D._rotation(angle, 2, 0)
+
+    @staticmethod
+    def rotation_z(angle):
+        return Transform3D._rotation(angle, 0, 1)
+
+    @staticmethod
+    def compose(*matrices):
+        """Зливає ланцюжок (або стеки) в одну матрицю; порядок — порядок застосування."""
+        return _compose(matrices)
+
+    @staticmethod
+    def axis_quaternion(axis, angle):
+        """Кватерніон (w, x, y, z) повороту навколо осі 0/1/2; для масиву кутів — (F, 4)."""
+        half = np.asarray(angle, dtype=np.float64) / 2
+        quaternion = np.zeros(half.shape + (4,))
+        quaternion[..., 0] = np.cos(half)
+        quaternion[..., 1 + axis] = np.sin(half)
+        return quaternion
+
+    @staticmethod
+    def quaternion_multiply(q1, q2):
+        """Добуток Гамільтона q1 * q2 (спочатку q2, потім q1), покомпонентно для стеків."""
+        w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+        w2, x2, y2, z2 = np.moveaxis(q2, -1, 0)
+        return np.stack([
+            w1*w2 - x1*x2 - y1*y2 - z1*z2,
+            w1*x2 + x1*w2 + y1*z2 - z1*y2,
+            w1*y2 - x1*z2 + y1*w2 + z1*x2,
+            w1*z2 + x1*y2 - y1*x2 + z1*w2,
+        ], axis=-1)
+
+    @staticmethod
+    def compose_quaternions(*quaternions):
+        """
+        Ланцюжок кватерніонів у порядку застосування. Після кожного кроку
+        нормалізуємо, тож похибка не накопичується навіть на тисячах поворотів.
+        """
+        result = quaternions[0]
+        for quaternion in quaternions[1:]:
+            result = Transform3D.quaternion_multiply(quaternion, result)
+            result = result / np.linalg.norm(result, axis=-1, keepdims=True)
+        return result
+
+    @staticmethod
+    def quaternion_matrix(quaternion):
+        """Одиничний кватерніон (або (F, 4)) -> матриця повороту 4x4 (або (F, 4, 4))."""
+        w, x, y, z = np.moveaxis(np.asarray(quaternion, dtype=np.float64), -1, 0)
+        matrix = np.zeros(w.shape + (4, 4))
+        matrix[..., 0, 0] = 1 - 2*(y*y + z*z)
+        matrix[..., 0, 1] = 2*(x*y - w*z)
+        matrix[..., 0, 2] = 2*(x*z + w*y)
+        matrix[..., 1, 0] = 2*(x*y + w*z)
+        matrix[..., 1, 1] = 1 - 2*(x*x + z*z)
+        matrix[..., 1, 2] = 2*(y*z - w*x)
+        matrix[..., 2, 0] = 2*(x*z - w*y)
+        matrix[..., 2, 1] = 2*(y*z + w*x)
+        matrix[..., 2, 2] = 1 - 2*(x*x + y*y)
+        matrix[..., 3, 3] = 1
+        return matrix
+
+    @staticmethod
+    def euler_rotation(angle_x, angle_y, angle_z, method='matrix'):
+        """
+        Rz @ Ry @ Rx для скалярів або цілої доріжки кутів за один виклик.
+        method='quaternion' складає повороти кватерніонами і будує матрицю один раз.
+        """
+        if method == 'quaternion':
+            return Transform3D.quaternion_matrix(Transform3D.compose_quaternions(
+                Transform3D.axis_quaternion(0, angle_x),
+                Transform3D.axis_quaternion(1, angle_y),
+                Transform3D.axis_quaternion(2, angle_z),
+            ))
+        return Transform3D.compose(
+            Transform3D.rotation_x(angle_x),
+            Transform3D.rotation_y(angle_y),
+            Transform3D.rotation_z(angle_z),
+        )
+
+    @staticmethod
+    def apply_transform(points, matrix, out=None):
+        """(N, 4) точки; для стеку (F, 4, 4) повертає (F, N, 4)."""
+        return _apply(points, matrix, out)
+
+
+def _compose(matrices):
+    # Зліва направо, як запис Rz @ Ry @ Rx: результат збігається біт у біт
+    result = matrices[-1]
+    for matrix in reversed(matrices[:-1]):
+        result = result @ matrix
+    return result
+
+
+def _apply(points, matrix, out):
+    """
+    Рядки points — однорідні точки. points @ M.T — те саме, що (M @ points.T).T,
+    але без транспонованої копії; з out= результат пишеться в готовий буфер.
+    np.dot з out= не виділяє жодного масиву (matmul виділяє службовий буфер
+    на кожен виклик). out може збігатися з points, але тоді numpy копіює вхід.
+    """
+    if matrix.ndim == 3:
+        return np.einsum('fij,nj->fni', matrix, points, out=out)
+    return np.dot(points, matrix.T, out=out)
+
+
+class Diamond2D:
+    def __init__(self, center=(0, 0), width=2, height=3):
+        cx, cy = center
+        self.original_points = np.array([
+            [cx, cy + height/2, 1],
+            [cx + width/2, cy, 1],
+            [cx, cy - height/2, 1],
+            [cx - width/2, cy, 1],
+        ], dtype=np.float64)
+        # Робочий буфер виділяється один раз; reset і трансформації пишуть у нього
+        self.points = self.original_points.copy()
+
+    def reset(self):
+        np.copyto(self.points, self.original_points)
+
+    def get_center(self, out=None):
+        """Центр (x, y, 1); з out= пишеться в готовий буфер із 3 елементів"""
+        if out is None:
+            out = np.ones(3)
+        np.mean(self.points[:, :2], axis=0, out=out[:2])
+        out[2] = 1
+        return out
+
+    def closed_outline(self, out=None):
+        """Вершини (x, y) із повтореною першою — замкнений контур (5, 2) для fill"""
+        if out is None:
+            out = np.empty((len(self.points) + 1, 2))
+        out[:-1] = self.points[:, :2]
+        out[-1] = self.points[0, :2]
+        return out
+
+    def animation_frames(self, frames, radius=8, translation_speed=0.15, rotation_speed=0.08):
+        """
+        Вершини ромба для всіх кадрів одразу, (F, N, 3): рух по колу, обертання
+        і пульсація масштабу відносно центру злиті в одну матрицю на кадр.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        angle_translation = frames * translation_speed
+        tx = radius * np.cos(angle_translation)
+        ty = radius * np.sin(angle_translation)
+        # Афінні перетворення зберігають центр мас, тож центр після зсуву відомий заздалегідь
+        center = self.original_points[:, :2].mean(axis=0) + np.stack([tx, ty], axis=-1)
+
+        scale_factor = 1 + 0.3 * np.sin(frames * 0.1)
+        transform = Transform2D.compose(
+            Transform2D.translation_matrix(tx, ty),
+            Transform2D.about_point(Transform2D.rotation_matrix(frames * rotation_speed), center),
+            Transform2D.about_point(Transform2D.scaling_matrix(scale_factor, scale_factor), center),
+        )
+        return Transform2D.apply_transform(self.original_points, transform)
+
+
+class Parallelepiped3D:
+    FACE_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F']
+
+    def __init__(self, center=(0, 0, 0), width=2, height=3, depth=1.5):
+        cx, cy, cz = center
+        w, h, d = width/2, height/2, depth/2
+
+        self.original_vertices = np.array([
+            [cx-w, cy-h, cz-d, 1], [cx+w, cy-h, cz-d, 1],
+            [cx+w, cy+h, cz-d, 1], [cx-w, cy+h, cz-d, 1],
+            [cx-w, cy-h, cz+d, 1], [cx+w, cy-h, cz+d, 1],
+            [cx+w, cy+h, cz+d, 1], [cx-w, cy+h, cz+d, 1],
+        ], dtype=np.float64)
+        self.vertices = self.original_vertices.copy()
+
+        self.faces = [
+            [0, 1, 2, 3], [4, 5, 6, 7],
+            [0, 1, 5, 4], [2, 3, 7, 6],
+            [0, 3, 7, 4], [1, 2, 6, 5],
+        ]
+        self.face_colors = list(self.FACE_COLORS)
+
+    def reset(self):
+        np.copyto(self.vertices, self.original_vertices)
+
+    def get_faces_vertices(self):
+        """(6, 4, 3) — вершини кожної грані одним індексуванням."""
+        return self.vertices[self.faces][..., :3]
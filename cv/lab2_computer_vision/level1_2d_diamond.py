@@ -1,7 +1,8 @@
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
+from frame_capture import export_animation
+from geometry import Diamond2D
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -9,110 +10,90 @@ logger = logging.getLogger(__name__)
 
 matplotlib.use('Agg')
 
-class Transform2D:
-    @staticmethod
-    def translation_matrix(dx, dy):
-        return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]])
-
-    @staticmethod
-    def rotation_matrix(angle):
-        cos_a, sin_a = np.cos(angle), np.sin(angle)
-        return np.array([[cos_a, -sin_a, 0], [sin_a, cos_a, 0], [0, 0, 1]])
-
-    @staticmethod
-    def scaling_matrix(sx, sy):
-        return np.array([[sx, 0, 0], [0, sy, 0], [0, 0, 1]])
-
-    @staticmethod
-    def apply_transform(points, matrix):
-        return (matrix @ points.T).T
-
-class Diamond2D:
-    def __init__(self, center=(0, 0), width=2, height=3):
-        cx, cy = center
-        self.original_points = np.array([
-            [cx, cy + height/2, 1],
-            [cx + width/2, cy, 1],
-            [cx, cy - height/2, 1],
-            [cx - width/2, cy, 1],
-        ])
-        self.points = self.original_points.copy()
-
-    def reset(self):
-        self.points = self.original_points.copy()
-
-    def get_center(self):
-        center_2d = np.mean(self.points[:, :2], axis=0)
-        return np.array([center_2d[0], center_2d[1], 1])
-
-def save_animation():
-    logger.info("\n🎬 Створення GIF анімації для IntelliJ IDEA...")
-    logger.info("⏳ Це займе ~30 секунд...\n")
-
-    fig, ax = plt.subplots(figsize=(10, 10))
+def build_animation(frames=200, dpi=None):
+    """
+    Фігура рівня I, готова до запису: (fig, update, draw). update(frame)
+    оновлює артисти кадру, draw() перемальовує змінну частину поверх фону.
+    """
+    fig, ax = plt.subplots(figsize=(10, 10), dpi=dpi)
     diamond = Diamond2D(center=(0, 0), width=3, height=4)
 
     translation_speed = 0.15
     rotation_speed = 0.08
 
+    # Статичні елементи створюються один раз
+    ax.set_xlim(-15, 15)
+    ax.set_ylim(-15, 15)
+    ax.set_aspect('equal')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlabel('X', fontsize=12)
+    ax.set_ylabel('Y', fontsize=12)
+    title = ax.set_title('', fontsize=13, fontweight='bold')
+
+    radius = 8
+    diamond_fill, = ax.fill(np.zeros(5), np.zeros(5),
+                            color='lightblue', edgecolor='darkblue', linewidth=2, alpha=0.7, label='Ромб')
+    center_marker, = ax.plot([], [], 'ro', markersize=8, label='Центр')
+
+    circle_angles = np.linspace(0, 2*np.pi, 100)
+    circle_x = radius * np.cos(circle_angles)
+    circle_y = radius * np.sin(circle_angles)
+    trajectory, = ax.plot(circle_x, circle_y, 'g--', alpha=0.3, linewidth=1, label='Траєкторія')
+
+    legend = ax.legend(loc='upper right')
+
+    # Геометрія всіх кадрів рахується одним пакетом
+    positions = diamond.animation_frames(np.arange(frames), radius, translation_speed, rotation_speed)
+
+    # Буфери кадру виділяються один раз: контур для fill і центр (x, y, 1)
+    closed_points = np.empty((5, 2))
+    final_center = np.empty(3)
+
     def update(frame):
-        ax.clear()
-        ax.set_xlim(-15, 15)
-        ax.set_ylim(-15, 15)
-        ax.set_aspect('equal')
-        ax.grid(True, alpha=0.3)
-        ax.set_xlabel('X', fontsize=12)
-        ax.set_ylabel('Y', fontsize=12)
-        ax.set_title(f'2D Трансформації - Кадр {frame}/200', fontsize=13, fontweight='bold')
-
-        diamond.reset()
-
-        angle_translation = frame * translation_speed
-        radius = 8
-        tx = radius * np.cos(angle_translation)
-        ty = radius * np.sin(angle_translation)
-        T = Transform2D.translation_matrix(tx, ty)
-        diamond.points = Transform2D.apply_transform(diamond.points, T)
-
-        current_center = diamond.get_center()
-        angle_rotation = frame * rotation_speed
-        T_to_origin = Transform2D.translation_matrix(-current_center[0], -current_center[1])
-        R = Transform2D.rotation_matrix(angle_rotation)
-        T_back = Transform2D.translation_matrix(current_center[0], current_center[1])
-        transform = T_back @ R @ T_to_origin
-        diamond.points = Transform2D.apply_transform(diamond.points, transform)
-
-        scale_factor = 1 + 0.3 * np.sin(frame * 0.1)
-        current_center = diamond.get_center()
-        T_to_origin = Transform2D.translation_matrix(-current_center[0], -current_center[1])
-        S = Transform2D.scaling_matrix(scale_factor, scale_factor)
-        T_back = Transform2D.translation_matrix(current_center[0], current_center[1])
-        transform = T_back @ S @ T_to_origin
-        diamond.points = Transform2D.apply_transform(diamond.points, transform)
-
-        closed_points = np.vstack([diamond.points[:, :2], diamond.points[0, :2]])
-        ax.fill(closed_points[:, 0], closed_points[:, 1],
-                color='lightblue', edgecolor='darkblue', linewidth=2, alpha=0.7, label='Ромб')
-
-        final_center = diamond.get_center()
-        ax.plot(final_center[0], final_center[1], 'ro', markersize=8, label='Центр')
-
-        circle_angles = np.linspace(0, 2*np.pi, 100)
-        circle_x = radius * np.cos(circle_angles)
-        circle_y = radius * np.sin(circle_angles)
-        ax.plot(circle_x, circle_y, 'g--', alpha=0.3, linewidth=1, label='Траєкторія')
-
-        ax.legend(loc='upper right')
+        title.set_text(f'2D Трансформації - Кадр {frame}/{frames}')
+
+        # Оновлюємо лише вершини, центр і заголовок
+        np.copyto(diamond.points, positions[frame])
+        diamond_fill.set_xy(diamond.closed_outline(out=closed_points))
+
+        diamond.get_center(out=final_center)
+        center_marker.set_data(final_center[0:1], final_center[1:2])
 
         if frame % 20 == 0:
-            logger.info(f"📹 Створено кадр {frame}/200 ({frame/200*100:.0f}%)")
+            logger.info(f"📹 Створено кадр {frame}/{frames} ({frame/frames*100:.0f}%)")
+
+    # Фон (підписи, тики) рендериться один раз. Сітка, траєкторія, рамка і легенда
+    # лежать над ромбом, тому перемальовуються після нього в тому ж порядку,
+    # що й при повному рендері — кадри збігаються піксель у піксель.
+    fig.canvas.draw()
+    gridlines = ax.get_xgridlines() + ax.get_ygridlines()
+    blitted = [diamond_fill, *gridlines, center_marker, trajectory, *ax.spines.values(), title, legend]
+    for artist in blitted:
+        artist.set_animated(True)
+    for line in gridlines:
+        line.set_visible(False)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    for line in gridlines:
+        line.set_visible(True)
+
+    def draw():
+        fig.canvas.restore_region(background)
+        for artist in blitted:
+            ax.draw_artist(artist)
+
+    return fig, update, draw
+
+def save_animation(frames=200, dpi=None):
+    """frames і dpi дозволяють зробити швидкий попередній перегляд меншої роздільності."""
+    logger.info("\n🎬 Створення GIF анімації для IntelliJ IDEA...")
+    logger.info("⏳ Це займе ~30 секунд...\n")
 
-    anim = FuncAnimation(fig, update, frames=200, interval=50, repeat=True)
+    fig, update, draw = build_animation(frames, dpi)
 
-    logger.info("\n💾 Збереження у 'diamond_animation.gif'...")
+    logger.info("\n💾 Потоковий запис у 'diamond_animation.gif'...")
 
-    writer = PillowWriter(fps=20)
-    anim.save('diamond_animation.gif', writer=writer, dpi=100)
+    export_animation(fig, update, range(frames), 'diamond_animation.gif', fps=20, draw=draw)
 
     logger.info("\n✅ ГОТОВО!")
     logger.info("📁 Файл збережено: diamond_animation.gif")
@@ -1,9 +1,13 @@
+import argparse
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
 from mpl_toolkits.mplot3d import Axes3D
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from matplotlib import font_manager
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from frame_capture import FrameEncoder, build_palette, export_animation
+from geometry import Parallelepiped3D, Transform3D
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
@@ -11,96 +15,85 @@ logger = logging.getLogger(__name__)
 
 matplotlib.use('Agg')
 
-class Transform3D:
-    @staticmethod
-    def rotation_x(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([
-            [1, 0, 0, 0],
-            [0, c, -s, 0],
-            [0, s, c, 0],
-            [0, 0, 0, 1]
-        ])
-
-    @staticmethod
-    def rotation_y(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([
-            [c, 0, s, 0],
-            [0, 1, 0, 0],
-            [-s, 0, c, 0],
-            [0, 0, 0, 1]
-        ])
-
-    @staticmethod
-    def rotation_z(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([
-            [c, -s, 0, 0],
-            [s, c, 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1]
-        ])
-
-    @staticmethod
-    def apply_transform(points, matrix):
-        return (matrix @ points.T).T
-
-class Parallelepiped3D:
-    def __init__(self, center=(0, 0, 0), width=2, height=3, depth=1.5):
-        cx, cy, cz = center
-        w, h, d = width/2, height/2, depth/2
-
-        self.original_vertices = np.array([
-            [cx-w, cy-h, cz-d, 1],
-            [cx+w, cy-h, cz-d, 1],
-            [cx+w, cy+h, cz-d, 1],
-            [cx-w, cy+h, cz-d, 1],
-            [cx-w, cy-h, cz+d, 1],
-            [cx+w, cy-h, cz+d, 1],
-            [cx+w, cy+h, cz+d, 1],
-            [cx-w, cy+h, cz+d, 1],
-        ])
-
-        self.vertices = self.original_vertices.copy()
-
-        self.faces = [
-            [0, 1, 2, 3],
-            [4, 5, 6, 7],
-            [0, 1, 5, 4],
-            [2, 3, 7, 6],
-            [0, 3, 7, 4],
-            [1, 2, 6, 5],
-        ]
-
-        self.face_colors = [
-            '#FF6B6B',
-            '#4ECDC4',
-            '#45B7D1',
-            '#FFA07A',
-            '#98D8C8',
-            '#F7DC6F',
-        ]
-
-    def reset(self):
-        self.vertices = self.original_vertices.copy()
-
-    def get_faces_vertices(self):
-        faces_vertices = []
-        for face in self.faces:
-            face_verts = self.vertices[face][:, :3]
-            faces_vertices.append(face_verts)
-        return faces_vertices
-
-def save_3d_animation():
+class SoftwareRenderer3D:
+    """
+    Легкий програмний рендер замість mplot3d: аксонометрична проекція граней,
+    сортування за глибиною (алгоритм художника) і растеризація прямо в кадр Pillow.
+    """
+    # Ребра куба осей: пари вершин, що відрізняються однією координатою
+    BOX_EDGES = [(i, i ^ bit) for i in range(8) for bit in (1, 2, 4) if i < i ^ bit]
+
+    def __init__(self, width=1200, height=1000, limit=5, elev=20, azim=30, dpi=100):
+        self.size = (width, height)
+        # Шрифти, відступи й товщина ліній задані в пунктах при 100 dpi, як у matplotlib
+        self.pixel_scale = dpi / 100
+        self.limit = limit
+        elev, azim = np.radians(elev), np.radians(azim)
+        # Базис камери: праворуч, вгору, до глядача (вісь Z — вертикаль, як у mplot3d)
+        right = np.array([-np.sin(azim), np.cos(azim), 0])
+        toward = np.array([np.cos(elev) * np.cos(azim), np.cos(elev) * np.sin(azim), np.sin(elev)])
+        up = np.cross(toward, right)
+        # Вісь Z стиснута так само, як у mplot3d (box aspect 4:4:3)
+        self.view = np.stack([right, up, toward]) * np.array([1, 1, 0.75])
+        self.scale = 0.42 * min(width, height) / (limit * np.sqrt(3))
+        self.center = np.array([width / 2, height / 2 + 0.03 * height])
+
+        font_path = font_manager.findfont(font_manager.FontProperties(family='DejaVu Sans', weight='bold'))
+        self.title_font = ImageFont.truetype(font_path, round(17 * self.pixel_scale))
+        self.label_font = ImageFont.truetype(font_path, round(16 * self.pixel_scale))
+
+        corners = np.array([[(i & 1) * 2 - 1, (i >> 1 & 1) * 2 - 1, (i >> 2 & 1) * 2 - 1]
+                            for i in range(8)]) * limit
+        self.box = self.project(corners)[:, :2]
+        self.axis_labels = [('X', self.project(np.array([[0, limit * 1.2, -limit]]))[0, :2]),
+                            ('Y', self.project(np.array([[limit * 1.2, 0, -limit]]))[0, :2]),
+                            ('Z', self.project(np.array([[limit * 1.2, -limit * 1.2, 0]]))[0, :2])]
+
+    def project(self, points):
+        """(N, 3+) точки -> (N, 3): піксельні x, y і глибина (більша — ближче до глядача)."""
+        view = points[:, :3] @ self.view.T
+        screen = np.empty_like(view)
+        screen[:, 0] = self.center[0] + view[:, 0] * self.scale
+        screen[:, 1] = self.center[1] - view[:, 1] * self.scale
+        screen[:, 2] = view[:, 2]
+        return screen
+
+    def render(self, vertices, faces, colors, title=None, alpha=0.85, linewidth=2):
+        """Кадр RGB з гранями (faces — списки індексів вершин) поверх куба осей."""
+        image = Image.new('RGB', self.size, 'white')
+        draw = ImageDraw.Draw(image, 'RGBA')
+        linewidth = max(1, round(linewidth * self.pixel_scale))
+
+        for a, b in self.BOX_EDGES:
+            draw.line([tuple(self.box[a]), tuple(self.box[b])], fill=(0, 0, 0, 60), width=1)
+        for text, position in self.axis_labels:
+            draw.text(tuple(position), text, fill='black', font=self.label_font, anchor='mm')
+
+        screen = self.project(vertices)
+        faces = np.asarray(faces)
+        # Спочатку найдальші грані, ближчі накладаються зверху
+        for i in np.argsort(screen[faces, 2].mean(axis=1)):
+            polygon = [tuple(p) for p in screen[faces[i], :2]]
+            fill = ImageColor.getrgb(colors[i]) + (int(round(alpha * 255)),)
+            draw.polygon(polygon, fill=fill, outline=(0, 0, 0, 255), width=linewidth)
+
+        if title:
+            draw.multiline_text((self.size[0] / 2, 20 * self.pixel_scale), title, fill='black',
+                                font=self.title_font, anchor='ma', align='center',
+                                spacing=round(6 * self.pixel_scale))
+        return image
+
+def save_3d_animation(backend='matplotlib', frames=200, dpi=None):
+    """
+    backend='matplotlib' — mplot3d з Poly3DCollection;
+    backend='software' — SoftwareRenderer3D, той самий GIF значно швидше.
+    frames і dpi дозволяють зробити швидкий попередній перегляд меншої роздільності.
+    """
     logger.info("\n" + "="*70)
     logger.info("🎬 СТВОРЕННЯ 3D АНІМАЦІЇ ПАРАЛЕЛЕПІПЕДА")
     logger.info("="*70)
     logger.info("⏳ Це займе ~40 секунд...\n")
 
-    fig = plt.figure(figsize=(12, 10))
-    ax = fig.add_subplot(111, projection='3d')
-
     parallelepiped = Parallelepiped3D(
         center=(0, 0, 0),
         width=3,
@@ -109,81 +102,107 @@ def save_3d_animation():
     )
 
     rotation_speed = 0.05
-    total_frames = 200
-
-    def update(frame):
-        ax.clear()
+    total_frames = frames
+    dpi = dpi or plt.rcParams['figure.dpi']
+    limit = 5
 
-        limit = 5
-        ax.set_xlim([-limit, limit])
-        ax.set_ylim([-limit, limit])
-        ax.set_zlim([-limit, limit])
-        ax.set_xlabel('X', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Y', fontsize=12, fontweight='bold')
-        ax.set_zlabel('Z', fontsize=12, fontweight='bold')
+    # Доріжка поворотів для всіх кадрів будується одним пакетом
+    angles = np.arange(total_frames) * rotation_speed
+    rotations = Transform3D.euler_rotation(angles, angles * 0.7, angles * 0.5)
 
+    def frame_title(frame):
         angle_deg = np.degrees(frame * rotation_speed)
-        ax.set_title(
-            f'3D Аксонометрична проекція: Обертання паралелепіпеда\n'
-            f'Кадр {frame}/{total_frames} | Кут: {angle_deg:.1f}°',
-            fontsize=13,
-            fontweight='bold',
-            pad=20
-        )
-
-        parallelepiped.reset()
-
-        angle = frame * rotation_speed
-        Rx = Transform3D.rotation_x(angle)
-        Ry = Transform3D.rotation_y(angle * 0.7)
-        Rz = Transform3D.rotation_z(angle * 0.5)
-
-        R_combined = Rz @ Ry @ Rx
-
-        parallelepiped.vertices = Transform3D.apply_transform(
-            parallelepiped.vertices, R_combined
-        )
-
-        faces_vertices = parallelepiped.get_faces_vertices()
-
-        poly_collection = Poly3DCollection(
-            faces_vertices,
-            facecolors=parallelepiped.face_colors,
-            edgecolors='black',
-            linewidths=2,
-            alpha=0.85
-        )
-
-        ax.add_collection3d(poly_collection)
-
-        ax.grid(True, alpha=0.3)
-        ax.view_init(elev=20, azim=30)
-
-        if frame % 20 == 0:
-            logger.info(f"📹 Створено кадр {frame}/{total_frames} ({frame/total_frames*100:.0f}%)")
-
-    anim = FuncAnimation(
-        fig,
-        update,
-        frames=total_frames,
-        interval=50,
-        repeat=True
-    )
+        return (f'3D Аксонометрична проекція: Обертання паралелепіпеда\n'
+                f'Кадр {frame}/{total_frames} | Кут: {angle_deg:.1f}°')
+
+    if backend == 'software':
+        renderer = SoftwareRenderer3D(width=round(12 * dpi), height=round(10 * dpi), limit=limit,
+                                      elev=20, azim=30, dpi=dpi)
+
+        def render(frame):
+            Transform3D.apply_transform(
+                parallelepiped.original_vertices, rotations[frame], out=parallelepiped.vertices
+            )
+            return renderer.render(
+                parallelepiped.vertices, parallelepiped.faces, parallelepiped.face_colors,
+                title=frame_title(frame)
+            )
+
+        # Одна палітра на весь GIF з вибірки кадрів: квантування кожного кадру
+        # до готової палітри в десятки разів дешевше за підбір власної
+        samples = [np.asarray(render(frame)) for frame in range(0, total_frames, 20)]
+        palette = build_palette(np.concatenate(samples))
+
+        logger.info("💾 Потоковий запис у 'parallelepiped_animation.gif'...")
+
+        with FrameEncoder('parallelepiped_animation.gif', fps=20, palette=palette) as encoder:
+            for frame in range(total_frames):
+                encoder.write(render(frame))
+
+                if frame % 20 == 0:
+                    logger.info(f"📹 Створено кадр {frame}/{total_frames} ({frame/total_frames*100:.0f}%)")
+    else:
+        fig = plt.figure(figsize=(12, 10), dpi=dpi)
+        ax = fig.add_subplot(111, projection='3d')
+
+        def update(frame):
+            ax.clear()
+
+            ax.set_xlim([-limit, limit])
+            ax.set_ylim([-limit, limit])
+            ax.set_zlim([-limit, limit])
+            ax.set_xlabel('X', fontsize=12, fontweight='bold')
+            ax.set_ylabel('Y', fontsize=12, fontweight='bold')
+            ax.set_zlabel('Z', fontsize=12, fontweight='bold')
 
-    logger.info("\n💾 Збереження у 'parallelepiped_animation.gif'...")
+            ax.set_title(
+                frame_title(frame),
+                fontsize=13,
+                fontweight='bold',
+                pad=20
+            )
 
-    writer = PillowWriter(fps=20)
-    anim.save('parallelepiped_animation.gif', writer=writer, dpi=100)
+            Transform3D.apply_transform(
+                parallelepiped.original_vertices, rotations[frame], out=parallelepiped.vertices
+            )
+
+            faces_vertices = parallelepiped.get_faces_vertices()
+
+            poly_collection = Poly3DCollection(
+                faces_vertices,
+                facecolors=parallelepiped.face_colors,
+                edgecolors='black',
+                linewidths=2,
+                alpha=0.85
+            )
+
+            ax.add_collection3d(poly_collection)
+
+            ax.grid(True, alpha=0.3)
+            ax.view_init(elev=20, azim=30)
+
+            if frame % 20 == 0:
+                logger.info(f"📹 Створено кадр {frame}/{total_frames} ({frame/total_frames*100:.0f}%)")
+
+        logger.info("💾 Потоковий запис у 'parallelepiped_animation.gif'...")
+
+        export_animation(fig, update, range(total_frames), 'parallelepiped_animation.gif', fps=20,
+                         palette_frames=range(0, total_frames, 25))
+
+        plt.close()
 
     logger.info("\n✅ ГОТОВО!")
     logger.info("📁 Файл збережено: parallelepiped_animation.gif")
     logger.info("🎬 Відкрийте GIF у будь-якому переглядачі зображень\n")
 
-    plt.close()
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Рівень II: 3D паралелепіпед у GIF")
+    parser.add_argument("--backend", choices=['matplotlib', 'software'], default='matplotlib',
+                        help="рендер кадрів: mplot3d або програмний SoftwareRenderer3D")
+    args = parser.parse_args()
+
     logger.info("\n" + "="*70)
     logger.info("🎯 РІВЕНЬ II: 3D ТРАНСФОРМАЦІЇ ПАРАЛЕЛЕПІПЕДА (GIF)")
     logger.info("="*70)
 
-    save_3d_animation()
\ No newline at end of file
+    save_3d_animation(backend=args.backend)
@@ -1,113 +1,51 @@
+import argparse
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
-from matplotlib.patches import Polygon
-from mpl_toolkits.mplot3d import Axes3D
+from PIL import ImageColor
+from frame_capture import FrameEncoder, export_animation, export_chunked
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-import random
-
-class Transform2D:
-    """Клас для 2D трансформацій"""
-
-    @staticmethod
-    def translation_matrix(dx, dy):
-        return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]])
-
-    @staticmethod
-    def rotation_matrix(angle):
-        cos_a, sin_a = np.cos(angle), np.sin(angle)
-        return np.array([[cos_a, -sin_a, 0], [sin_a, cos_a, 0], [0, 0, 1]])
-
-    @staticmethod
-    def scaling_matrix(sx, sy):
-        return np.array([[sx, 0, 0], [0, sy, 0], [0, 0, 1]])
-
-    @staticmethod
-    def apply_transform(points, matrix):
-        return (matrix @ points.T).T
-
-class Transform3D:
-    """Клас для 3D трансформацій"""
-
-    @staticmethod
-    def rotation_x(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([[1, 0, 0, 0], [0, c, -s, 0], [0, s, c, 0], [0, 0, 0, 1]])
-
-    @staticmethod
-    def rotation_y(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([[c, 0, s, 0], [0, 1, 0, 0], [-s, 0, c, 0], [0, 0, 0, 1]])
-
-    @staticmethod
-    def rotation_z(angle):
-        c, s = np.cos(angle), np.sin(angle)
-        return np.array([[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
-
-    @staticmethod
-    def apply_transform(points, matrix):
-        return (matrix @ points.T).T
-
-class Diamond2D:
-    """Ромб для 2D"""
-
-    def __init__(self, center=(0, 0), width=2, height=3):
-        cx, cy = center
-        self.original_points = np.array([
-            [cx, cy + height/2, 1],
-            [cx + width/2, cy, 1],
-            [cx, cy - height/2, 1],
-            [cx - width/2, cy, 1],
-        ])
-        self.points = self.original_points.copy()
-
-    def reset(self):
-        self.points = self.original_points.copy()
-
-    def get_center(self):
-        center_2d = np.mean(self.points[:, :2], axis=0)
-        return np.array([center_2d[0], center_2d[1], 1])
-
-class Parallelepiped3D:
-    """Паралелепіпед для 3D"""
-
-    def __init__(self, center=(0, 0, 0), width=2, height=3, depth=1.5):
-        cx, cy, cz = center
-        w, h, d = width/2, height/2, depth/2
-
-        self.original_vertices = np.array([
-            [cx-w, cy-h, cz-d, 1], [cx+w, cy-h, cz-d, 1],
-            [cx+w, cy+h, cz-d, 1], [cx-w, cy+h, cz-d, 1],
-            [cx-w, cy-h, cz+d, 1], [cx+w, cy-h, cz+d, 1],
-            [cx+w, cy+h, cz+d, 1], [cx-w, cy+h, cz+d, 1],
-        ])
-
-        self.vertices = self.original_vertices.copy()
-
-        self.faces = [
-            [0, 1, 2, 3], [4, 5, 6, 7],
-            [0, 1, 5, 4], [2, 3, 7, 6],
-            [0, 3, 7, 4], [1, 2, 6, 5],
-        ]
-
-        self.face_colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F']
-
-    def reset(self):
-        self.vertices = self.original_vertices.copy()
-
-    def get_faces_vertices(self):
-        faces_vertices = []
-        for face in self.faces:
-            face_verts = self.vertices[face][:, :3]
-            faces_vertices.append(face_verts)
-        return faces_vertices
+from geometry import Diamond2D, Parallelepiped3D, Transform2D, Transform3D
+from level2_3d_parallelepiped import SoftwareRenderer3D
+
+FADE_STEP = 0.05
+HOLD_FRAMES = 40
+
+def fade_cycle():
+    """
+    Прозорість ромба впродовж одного циклу появи, показу й зникнення: для
+    кожного кадру пара (alpha в заголовку, alpha ромба). Значення накопичуються
+    покроково, як у float-арифметиці, тож підписи збігаються з ітеративною логікою.
+    Цикл закінчується кадром, на якому ромб повністю зник.
+    """
+    alpha, fade_in, phase = 0.0, True, 0
+    cycle = []
+    while True:
+        title_alpha = alpha
+        if fade_in:
+            alpha += FADE_STEP
+            if alpha >= 1.0:
+                alpha, fade_in, phase = 1.0, False, 0
+        else:
+            phase += 1
+            if phase > HOLD_FRAMES:  # Тривалість показу
+                alpha -= FADE_STEP
+                if alpha <= 0.0:
+                    cycle.append((title_alpha, 0.0))
+                    return cycle
+        cycle.append((title_alpha, alpha))
 
 class CombinedAnimationGIF:
     """Комбінована анімація для збереження в GIF"""
 
-    def __init__(self):
+    def __init__(self, backend='matplotlib', dpi=None, seed=0):
+        # backend='software' малює паралелепіпед SoftwareRenderer3D поза matplotlib
+        self.backend = backend
+        # Від seed залежать лише позиції й кольори ромба; будь-який кадр — функція (seed, frame)
+        self.seed = seed
+        self.total_frames = 300
+
         # ВАЖЛИВО: Спочатку визначаємо список кольорів
         self.colors = [
             '#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A',
@@ -116,7 +54,7 @@ class CombinedAnimationGIF:
         ]
 
         # Тепер створюємо фігуру
-        self.fig = plt.figure(figsize=(16, 8))
+        self.fig = plt.figure(figsize=(16, 8), dpi=dpi)
 
         # 2D підграфік
         self.ax2d = self.fig.add_subplot(121)
@@ -125,34 +63,77 @@ class CombinedAnimationGIF:
         self.ax2d.set_aspect('equal')
 
         # 3D підграфік
-        self.ax3d = self.fig.add_subplot(122, projection='3d')
-        self.ax3d.set_xlim(-5, 5)
-        self.ax3d.set_ylim(-5, 5)
-        self.ax3d.set_zlim(-5, 5)
+        if self.backend == 'software':
+            # Порожнє місце під 3D панель: готовий кадр рендера вставляється прямо в буфер фігури
+            self.ax3d = self.fig.add_subplot(122)
+            self.ax3d.axis('off')
+            x0, y0, x1, y1 = self.ax3d.bbox.extents
+            self.panel_3d_origin = (int(round(x0)), int(round(self.fig.bbox.height - y1)))
+            self.renderer_3d = SoftwareRenderer3D(
+                width=int(round(x1 - x0)), height=int(round(y1 - y0)), limit=5, elev=20, azim=30,
+                dpi=self.fig.dpi
+            )
+            self.image_3d = None
+        else:
+            self.ax3d = self.fig.add_subplot(122, projection='3d')
+            self.ax3d.set_xlim(-5, 5)
+            self.ax3d.set_ylim(-5, 5)
+            self.ax3d.set_zlim(-5, 5)
 
         # Об'єкти
         self.diamond_2d = Diamond2D(center=(0, 0), width=3, height=4)
         self.parallelepiped_3d = Parallelepiped3D(center=(0, 0, 0), width=3, height=4, depth=2)
 
         # Параметри 2D анімації
-        self.appearance_phase = 0
-        self.target_position = (0, 0)
-        self.current_color = self.get_random_color()  # Тепер це працює!
-        self.alpha_value = 0.0
-        self.fade_in = True
+        self.fade_cycle = fade_cycle()
+        self.transform_2d = np.empty((3, 3))
+        # Буфери кадру: замкнений контур ромба і його центр
+        self.closed_points = np.empty((5, 2))
+        self.center_2d = np.empty(3)
 
         # Параметри 3D
         self.rotation_speed_3d = 0.05
 
-    def get_random_color(self):
-        """Отримання випадкового кольору"""
-        return random.choice(self.colors)
-
-    def get_random_position(self):
-        """Отримання випадкової позиції"""
-        x = random.uniform(-10, 10)
-        y = random.uniform(-10, 10)
-        return (x, y)
+        self.prepare(300)
+
+    def prepare(self, frames):
+        """Доріжки обертань і розклад ключових кадрів 2D, що покривають frames кадрів"""
+        self.rotations_2d = self.rotation_track_2d(frames)
+        self.rotations_3d = self.rotation_track(frames)
+        cycles = -(-frames // len(self.fade_cycle))
+        self.keyframes = [self.keyframe(cycle) for cycle in range(cycles)]
+
+    def rotation_track_2d(self, frames):
+        """Обертання ромба навколо його початкового центру для всіх кадрів, (frames, 3, 3)"""
+        center = self.diamond_2d.original_points[:, :2].mean(axis=0)
+        return Transform2D.about_point(Transform2D.rotation_matrix(np.arange(frames) * 0.02), center)
+
+    def rotation_track(self, frames):
+        """Матриці обертання паралелепіпеда для всіх кадрів, (frames, 4, 4)"""
+        angles = np.arange(frames) * self.rotation_speed_3d
+        return Transform3D.euler_rotation(angles, angles * 0.7, angles * 0.5)
+
+    def keyframe(self, cycle):
+        """
+        Позиція й колір ромба для циклу появи cycle. Кожен цикл має власний
+        генератор, засіяний (seed, cycle), тож не залежить від попередніх циклів.
+        Перший цикл починається в центрі.
+        """
+        rng = np.random.default_rng([self.seed, cycle])
+        position = tuple(rng.uniform(-10, 10, 2).tolist()) if cycle else (0, 0)
+        color = self.colors[rng.integers(len(self.colors))]
+        return position, color
+
+    def state_2d(self, frame):
+        """
+        Стан 2D частини на кадрі frame без проходу попередніх кадрів:
+        (alpha в заголовку, alpha ромба, позиція, колір)
+        """
+        cycle, offset = divmod(frame, len(self.fade_cycle))
+        title_alpha, alpha = self.fade_cycle[offset]
+        if cycle >= len(self.keyframes):
+            return title_alpha, alpha, *self.keyframe(cycle)
+        return title_alpha, alpha, *self.keyframes[cycle]
 
     def update_2d(self, frame):
         """Оновлення 2D частини"""
@@ -163,70 +144,39 @@ class CombinedAnimationGIF:
         self.ax2d.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
         self.ax2d.set_xlabel('X', fontsize=11, fontweight='bold')
         self.ax2d.set_ylabel('Y', fontsize=11, fontweight='bold')
+        title_alpha, alpha_value, (tx, ty), color = self.state_2d(frame)
         self.ax2d.set_title(
-            f'2D: Ромб з динамічною появою\nAlpha: {self.alpha_value:.2f}',
+            f'2D: Ромб з динамічною появою\nAlpha: {title_alpha:.2f}',
             fontsize=12, fontweight='bold', pad=10
         )
 
-        # Логіка появи/зникнення
-        if self.fade_in:
-            self.alpha_value += 0.05
-            if self.alpha_value >= 1.0:
-                self.alpha_value = 1.0
-                self.fade_in = False
-                self.appearance_phase = 0
-        else:
-            self.appearance_phase += 1
-            if self.appearance_phase > 40:  # Тривалість показу
-                self.alpha_value -= 0.05
-                if self.alpha_value <= 0.0:
-                    self.alpha_value = 0.0
-                    self.fade_in = True
-                    # Нова позиція та колір
-                    self.target_position = self.get_random_position()
-                    self.current_color = self.get_random_color()
-
-        # Трансформації
-        self.diamond_2d.reset()
-
-        # Переміщення
-        tx, ty = self.target_position
-        T = Transform2D.translation_matrix(tx, ty)
-        self.diamond_2d.points = Transform2D.apply_transform(self.diamond_2d.points, T)
-
-        # Обертання
+        # Трансформації: обертання навколо центру не залежить від зсуву, тож
+        # зсув дописується в готову матрицю кадру, і вершини пишуться одразу в буфер
         angle = frame * 0.02
-        center = self.diamond_2d.get_center()
-
-        T_to_origin = Transform2D.translation_matrix(-center[0], -center[1])
-        R = Transform2D.rotation_matrix(angle)
-        T_back = Transform2D.translation_matrix(center[0], center[1])
-
-        transform = T_back @ R @ T_to_origin
-        self.diamond_2d.points = Transform2D.apply_transform(self.diamond_2d.points, transform)
+        np.copyto(self.transform_2d, self.rotations_2d[frame])
+        self.transform_2d[0, 2] += tx
+        self.transform_2d[1, 2] += ty
+        Transform2D.apply_transform(self.diamond_2d.original_points, self.transform_2d, out=self.diamond_2d.points)
 
         # Відображення
-        if self.alpha_value > 0:
-            closed_points = np.vstack([
-                self.diamond_2d.points[:, :2],
-                self.diamond_2d.points[0, :2]
-            ])
+        if alpha_value > 0:
+            closed_points = self.diamond_2d.closed_outline(out=self.closed_points)
 
             self.ax2d.fill(
                 closed_points[:, 0], closed_points[:, 1],
-                color=self.current_color,
+                color=color,
                 edgecolor='black',
                 linewidth=2,
-                alpha=self.alpha_value
+                alpha=alpha_value
             )
 
             # Центр
-            final_center = self.diamond_2d.get_center()
+            final_center = self.diamond_2d.get_center(out=self.center_2d)
             self.ax2d.plot(
                 final_center[0], final_center[1],
                 'ko', markersize=6,
                 markerfacecolor='red',
-                alpha=self.alpha_value,
+                alpha=alpha_value,
                 zorder=5
             )
 
@@ -234,7 +184,7 @@ class CombinedAnimationGIF:
             info_text = (
                 f'Позиція: ({tx:.1f}, {ty:.1f})\n'
                 f'Кут: {np.degrees(angle):.0f}°\n'
-                f'Колір: {self.current_color}'
+                f'Колір: {color}'
             )
 
             self.ax2d.text(
@@ -247,6 +197,10 @@ class CombinedAnimationGIF:
 
     def update_3d(self, frame):
         """Оновлення 3D частини"""
+        if self.backend == 'software':
+            self.update_3d_software(frame)
+            return
+
         self.ax3d.clear()
         self.ax3d.set_xlim(-5, 5)
         self.ax3d.set_ylim(-5, 5)
@@ -262,17 +216,8 @@ class CombinedAnimationGIF:
         )
 
         # Обертання
-        self.parallelepiped_3d.reset()
-
-        angle = frame * self.rotation_speed_3d
-        Rx = Transform3D.rotation_x(angle)
-        Ry = Transform3D.rotation_y(angle * 0.7)
-        Rz = Transform3D.rotation_z(angle * 0.5)
-
-        R_combined = Rz @ Ry @ Rx
-
-        self.parallelepiped_3d.vertices = Transform3D.apply_transform(
-            self.parallelepiped_3d.vertices, R_combined
+        Transform3D.apply_transform(
+            self.parallelepiped_3d.original_vertices, self.rotations_3d[frame], out=self.parallelepiped_3d.vertices
         )
 
         # Відображення
@@ -290,33 +235,86 @@ class CombinedAnimationGIF:
         self.ax3d.grid(True, alpha=0.3)
         self.ax3d.view_init(elev=20, azim=30)
 
+    def update_3d_software(self, frame):
+        """Оновлення 3D частини програмним рендером (разом із заголовком)"""
+        angle_deg = np.degrees(frame * self.rotation_speed_3d)
+
+        Transform3D.apply_transform(
+            self.parallelepiped_3d.original_vertices, self.rotations_3d[frame], out=self.parallelepiped_3d.vertices
+        )
+
+        self.image_3d = self.renderer_3d.render(
+            self.parallelepiped_3d.vertices,
+            self.parallelepiped_3d.faces,
+            self.parallelepiped_3d.face_colors,
+            title=f'3D: Паралелепіпед (обертання)\nКут: {angle_deg:.1f}°',
+            linewidth=1
+        )
+
+    def fade_colors(self):
+        """Кольори ромба, підпису і центру на білому тлі для кожного кроку прозорості 0.1"""
+        alphas = np.arange(1, 11)[:, None, None] / 10
+        rgb = np.array([ImageColor.getrgb(c) for c in self.colors + ['wheat', 'red', 'black']])[None]
+        return np.round(255 * (1 - alphas) + rgb * alphas).astype(np.uint8).reshape(-1, 3)
+
+    def grab_frame(self):
+        """
+        Поточний кадр фігури (h, w, 4) — сам буфер полотна Agg без копії, з
+        програмною 3D панеллю, вписаною прямо в нього
+        """
+        self.fig.canvas.draw()
+        frame = np.asarray(self.fig.canvas.buffer_rgba())
+        x, y = self.panel_3d_origin
+        panel = np.asarray(self.image_3d)
+        frame[y:y + panel.shape[0], x:x + panel.shape[1], :3] = panel
+        return frame
+
     def update(self, frame):
         """Оновлення обох частин"""
         self.update_2d(frame)
         self.update_3d(frame)
 
         if frame % 20 == 0:
-            print(f"📹 Створено кадр {frame}/300 ({frame/300*100:.0f}%)")
-
-    def save(self, filename='combined_animation.gif', frames=300):
-        """Збереження анімації"""
+            print(f"📹 Створено кадр {frame}/{self.total_frames} ({frame/self.total_frames*100:.0f}%)")
+
+    def render_frame(self, frame):
+        """Готовий кадр (h, w, 4) з номером frame — залежить лише від (seed, frame)"""
+        self.update(frame)
+        if self.backend == 'software':
+            return self.grab_frame()
+        self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba())
+
+    def save(self, filename='combined_animation.gif', frames=300, chunk_size=None):
+        """
+        Збереження анімації. З chunk_size кадри пишуться сегментами з маніфестом
+        у '<filename>.parts': перерваний експорт при повторному запуску
+        продовжується з першого незавершеного сегмента.
+        """
         print("\n" + "="*70)
         print("🎬 СТВОРЕННЯ КОМБІНОВАНОЇ АНІМАЦІЇ (2D + 3D)")
         print("="*70)
         print(f"⏳ Створення {frames} кадрів... Це займе ~60 секунд\n")
-
-        anim = FuncAnimation(
-            self.fig,
-            self.update,
-            frames=frames,
-            interval=50,
-            repeat=True
-        )
-
-        print(f"\n💾 Збереження у '{filename}'...")
-
-        writer = PillowWriter(fps=20)
-        anim.save(filename, writer=writer, dpi=100)
+        self.total_frames = frames
+
+        if frames > len(self.rotations_3d):
+            self.prepare(frames)
+
+        print(f"\n💾 Потоковий запис у '{filename}'...")
+
+        # Кольори ромба з'являються лише пізніше, тож резервуємо їх у глобальній палітрі
+        extra_colors = self.fade_colors()
+        if chunk_size:
+            params = {'backend': self.backend, 'dpi': self.fig.dpi, 'seed': self.seed}
+            export_chunked(self.render_frame, frames, filename, chunk_size=chunk_size, fps=20,
+                           params=params, extra_colors=extra_colors)
+        elif self.backend == 'software':
+            with FrameEncoder(filename, fps=20, extra_colors=extra_colors) as encoder:
+                for frame in range(frames):
+                    self.update(frame)
+                    encoder.write(self.grab_frame())
+        else:
+            export_animation(self.fig, self.update, range(frames), filename, fps=20, extra_colors=extra_colors)
 
         print("\n✅ ГОТОВО!")
         print(f"📁 Файл збережено: {filename}")
@@ -325,19 +323,33 @@ class CombinedAnimationGIF:
 
         plt.close()
 
-def save_combined_animation():
-    """Головна функція для збереження комбінованої анімації"""
+def save_combined_animation(backend='matplotlib', frames=300, dpi=None, seed=0, chunk_size=None):
+    """
+    Головна функція для збереження комбінованої анімації; frames і dpi
+    дозволяють зробити швидкий попередній перегляд меншої роздільності,
+    seed задає позиції й кольори ромба, chunk_size вмикає експорт сегментами
+    """
     print("\n" + "="*70)
     print("🎯 РІВЕНЬ III: КОМБІНОВАНА АНІМАЦІЯ")
     print("="*70)
 
     try:
-        anim = CombinedAnimationGIF()
-        anim.save('combined_animation.gif', frames=300)
+        anim = CombinedAnimationGIF(backend=backend, dpi=dpi, seed=seed)
+        anim.save('combined_animation.gif', frames=frames, chunk_size=chunk_size)
     except Exception as e:
+        # Помилка йде далі: той, хто викликав (зокрема паралельний запуск), має її побачити
         print(f"\n❌ ПОМИЛКА: {e}")
-        import traceback
-        traceback.print_exc()
+        if chunk_size:
+            print("🔁 Готові сегменти збережено: повторний запуск продовжить експорт з місця зупинки")
+        raise
 
 if __name__ == "__main__":
-    save_combined_animation()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Рівень III: комбінована анімація у GIF")
+    parser.add_argument("--backend", choices=['matplotlib', 'software'], default='matplotlib',
+                        help="рендер 3D частини: mplot3d або програмний SoftwareRenderer3D")
+    parser.add_argument("--seed", type=int, default=0, help="зерно позицій і кольорів ромба")
+    parser.add_argument("--chunk-size", type=int,
+                        help="писати сегментами по стільки кадрів, щоб перерваний експорт можна було продовжити")
+    args = parser.parse_args()
+
+    save_combined_animation(backend=args.backend, seed=args.seed, chunk_size=args.chunk_size)
\ No newline at end of file
@@ -1,19 +1,87 @@
-import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-from matplotlib.animation import FuncAnimation, PillowWriter
-from matplotlib.patches import Polygon
-from mpl_toolkits.mplot3d import Axes3D
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-import random
+import argparse
 import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+from level1_2d_diamond import save_animation
+from level2_3d_parallelepiped import save_3d_animation
+from level3_combined import save_combined_animation
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
-# ... (тут весь код класів Transform2D, Transform3D, Diamond2D, Parallelepiped3D)
+LEVELS = {
+    '1': ('Рівень I', save_animation),
+    '2': ('Рівень II', save_3d_animation),
+    '3': ('Рівень III', save_combined_animation),
+}
+
+class PrefixedStream:
+    """Потік, що додає назву рівня на початок кожного рядка, щоб прогрес процесів не змішувався"""
+
+    def __init__(self, stream, prefix):
+        self.stream = stream
+        self.prefix = f"[{prefix}] "
+        self.at_line_start = True
+
+    def write(self, text):
+        for line in text.splitlines(keepends=True):
+            if self.at_line_start:
+                self.stream.write(self.prefix)
+            self.stream.write(line)
+            self.at_line_start = line.endswith('\n')
+            if self.at_line_start:
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def run_level(key, options):
+    """
+    Створює анімацію одного рівня і повертає час у секундах. В окремому процесі
+    весь вивід рівня (logging і print) отримує префікс з його назвою.
+    """
+    name, save = LEVELS[key]
+    stream = PrefixedStream(sys.stdout, name)
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=stream, force=True)
+    start = time.perf_counter()
+    with redirect_stdout(stream):
+        save(**options)
+    return time.perf_counter() - start
+
+def run_all_parallel(options):
+    """
+    Усі три рівні одночасно, кожен у власному процесі. 'spawn' дає кожному
+    чистий інтерпретатор із власним matplotlib на Agg, тож загальний час
+    близький до найповільнішого рівня (за наявності трьох вільних ядер).
+    Повертає True, якщо всі рівні завершилися без помилок.
+    """
+    start = time.perf_counter()
+    failed = []
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(len(LEVELS), mp_context=context) as pool:
+        futures = {pool.submit(run_level, key, options): key for key in LEVELS}
+        for future in as_completed(futures):
+            name, _ = LEVELS[futures[future]]
+            try:
+                logger.info(f"✅ {name}: {future.result():.1f} с")
+            except Exception as e:
+                # Решта рівнів доробляється; підсумок нижче покаже, що не вдалося
+                logger.info(f"❌ {name}: {type(e).__name__}: {e}")
+                failed.append(name)
+    logger.info(f"⏱ Усі три анімації за {time.perf_counter() - start:.1f} с")
+    if failed:
+        logger.info(f"❌ Не вдалося: {', '.join(failed)}")
+    return not failed
+
+def main_menu(frames=None, dpi=None):
+    """frames і dpi (якщо задані) перевизначають кількість кадрів і роздільність усіх рівнів"""
+    options = {name: value for name, value in (('frames', frames), ('dpi', dpi)) if value is not None}
 
-def main_menu():
     logger.info("\n" + "="*70)
     logger.info("🎯 ЛАБОРАТОРНА РОБОТА: 2D/3D ТРАНСФОРМАЦІЇ")
     logger.info("="*70)
@@ -27,20 +95,21 @@ def main_menu():
 
     choice = input("\n👉 Ваш вибір: ").strip()
 
-    if choice == '1':
-        logger.info("\n🎬 Створення Рівня I...")
-        # save_animation() # Виклик функції з першого повідомлення
-    elif choice == '2':
-        logger.info("\n🎬 Створення Рівня II...")
-        # save_3d_animation() # Виклик функції з другого повідомлення
-    elif choice == '3':
-        logger.info("\n🎬 Створення Рівня III...")
-        # Код збереження рівня III
+    if choice in LEVELS:
+        name, save = LEVELS[choice]
+        logger.info(f"\n🎬 Створення: {name}...")
+        save(**options)
     elif choice.lower() in ['all', 'всі', '🎬']:
-        logger.info("\n🎬 Створення всіх трьох анімацій...")
-        # Виклик усіх функцій
+        logger.info("\n🎬 Створення всіх трьох анімацій паралельно...")
+        if not run_all_parallel(options):
+            sys.exit(1)
     else:
         logger.info("\n👋 До побачення!")
 
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Лабораторна робота 2: 2D/3D трансформації")
+    parser.add_argument("--frames", type=int, help="кількість кадрів для кожного рівня (швидкий перегляд)")
+    parser.add_argument("--dpi", type=int, help="роздільність кадрів, за замовчуванням 100")
+    args = parser.parse_args()
+
+    main_menu(frames=args.frames, dpi=args.dpi)
@@ -0,0 +1,183 @@
+import argparse
+import math
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from main import ANGLES, PyramidResearcher, render_frames
+
+# Square canvas sizes: reference, Full HD height, 4K height
+SIZES = [400, 1080, 2160]
+# Triangle counts for the batched mesh rasterizer
+MESH_SIZES = [4, 100, 1000, 10000, 50000]
+# Level III kernels, reference first
+FILTER_METHODS = ['numpy', 'fused', 'cv2', 'float16', 'uint8']
+
+
+def render_faces(researcher, angle, vectorized):
+    """Renders the Level II faces of one frame, the same way run_experiment does."""
+    canvas = np.zeros((researcher.size, researcher.size, 3), dtype=np.uint8)
+    pulse = (math.sin(math.radians(angle)) + 1) / 2
+    rotated = [researcher.rotate_y(v, angle) for v in researcher.verts]
+    proj = [researcher.project(v) for v in rotated]
+    for i, f in enumerate(researcher.faces):
+        p_tri = [proj[f[0]], proj[f[1]], proj[f[2]]]
+        researcher.draw_l2_fill(canvas, p_tri, [int(200*pulse), 100, 50 + i*50], vectorized=vectorized)
+    return canvas
+
+
+def bench_fill(sizes, frames, loop_frames):
+    """Frames/sec of the per-pixel loop vs the vectorized fill."""
+    print(f"{'size':>6} {'loop fps':>10} {'vector fps':>11} {'speedup':>8} {'identical':>10}")
+    for size in sizes:
+        researcher = PyramidResearcher(size)
+        angles = list(range(0, 360, 8))
+
+        start = time.perf_counter()
+        for angle in angles[:loop_frames]:
+            ref = render_faces(researcher, angle, vectorized=False)
+        loop_fps = loop_frames / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for k in range(frames):
+            render_faces(researcher, angles[k % len(angles)], vectorized=True)
+        vec_fps = frames / (time.perf_counter() - start)
+
+        same = np.array_equal(ref, render_faces(researcher, angles[loop_frames - 1], vectorized=True))
+        print(f"{size:>6} {loop_fps:>10.2f} {vec_fps:>11.2f} {vec_fps / loop_fps:>7.1f}x {str(same):>10}")
+
+
+def random_mesh(n, size, rng):
+    """n independent triangles scattered over the canvas, sized to overlap a few times."""
+    centers = rng.uniform(0, size, (n, 1, 2))
+    radius = 2 * size / math.sqrt(n)
+    pts = (centers + rng.uniform(-radius, radius, (n, 3, 2))).astype(int).reshape(-1, 2)
+    depths = rng.uniform(0, 1, 3 * n)
+    faces = np.arange(3 * n).reshape(n, 3)
+    colors = rng.integers(0, 256, (n, 3))
+    return pts, depths, faces, colors
+
+
+def bench_mesh(size, counts, repeats):
+    """Triangles/sec and covered pixels/sec of draw_l2_mesh as the mesh grows."""
+    researcher = PyramidResearcher(size)
+    rng = np.random.default_rng(0)
+    print(f"\ndraw_l2_mesh on a {size}px canvas")
+    print(f"{'triangles':>10} {'ms/frame':>9} {'tris/sec':>12} {'pixels/sec':>12}")
+    for n in counts:
+        pts, depths, faces, colors = random_mesh(n, size, rng)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            canvas = np.zeros((size, size, 3), dtype=np.uint8)
+            zbuf = researcher.draw_l2_mesh(canvas, pts, depths, faces, colors)
+        elapsed = (time.perf_counter() - start) / repeats
+        covered = np.isfinite(zbuf).sum()
+        print(f"{n:>10} {elapsed * 1000:>9.2f} {n / elapsed:>12.0f} {covered / elapsed:>12.0f}")
+
+
+def bench_lines(size, counts, repeats):
+    """Wireframe cost: per-edge scalar loop vs one draw_l1_lines call."""
+    researcher = PyramidResearcher(size)
+    rng = np.random.default_rng(0)
+    print(f"\ndraw_l1_lines on a {size}px canvas (wireframe of a random mesh)")
+    print(f"{'triangles':>10} {'edges':>7} {'loop ms':>9} {'batch ms':>9} {'speedup':>8}")
+    for n in counts:
+        pts, _, faces, _ = random_mesh(n, size, rng)
+        starts = pts[faces].reshape(-1, 2)
+        ends = pts[np.roll(faces, -1, axis=1)].reshape(-1, 2)
+        canvas = np.zeros((size, size, 3), dtype=np.uint8)
+
+        loop_edges = min(len(starts), 300)
+        start = time.perf_counter()
+        for p1, p2 in zip(starts[:loop_edges].tolist(), ends[:loop_edges].tolist()):
+            researcher.draw_l1_line(canvas, p1, p2, (0, 255, 100), (255, 100, 0), vectorized=False)
+        loop_ms = (time.perf_counter() - start) * 1000 * len(starts) / loop_edges
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            researcher.draw_l1_lines(canvas, starts, ends, (0, 255, 100), (255, 100, 0))
+        batch_ms = (time.perf_counter() - start) * 1000 / repeats
+        print(f"{n:>10} {len(starts):>7} {loop_ms:>9.1f} {batch_ms:>9.1f} {loop_ms / batch_ms:>7.1f}x")
+
+
+def bench_filter(height, width, repeats):
+    """Time and peak traced memory per frame of each apply_l3_filter kernel."""
+    researcher = PyramidResearcher()
+    img = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    out = np.empty_like(img)
+    ref = researcher.apply_l3_filter(img)
+    print(f"\napply_l3_filter on a {width}x{height} frame")
+    print(f"{'method':>8} {'ms/frame':>9} {'peak MB':>8} {'scratch MB':>11} {'max diff':>9}")
+    for method in FILTER_METHODS:
+        # Warm-up fills the mask cache and scratch buffers
+        researcher._masks.clear()
+        researcher._buffers.clear()
+        researcher.apply_l3_filter(img, method=method, out=out)
+        cached = list(researcher._masks.values()) + list(researcher._buffers.values())
+        scratch = sum(a.nbytes for a in cached)
+        tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            researcher.apply_l3_filter(img, method=method, out=out)
+        elapsed = (time.perf_counter() - start) / repeats
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        diff = np.abs(out.astype(int) - ref).max()
+        print(f"{method:>8} {elapsed * 1000:>9.1f} {peak / 2**20:>8.1f} {scratch / 2**20:>11.1f} {diff:>9}")
+
+
+def bench_chain(height, width, repeats):
+    """A chain of matrix filters is folded into one matrix, so its cost stays flat."""
+    researcher = PyramidResearcher()
+    img = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    out = np.empty_like(img)
+    chain = ['sepia', 'warm', 'channel_swap', 'grayscale', 'invert']
+    print(f"\nFused matrix chains on a {width}x{height} frame")
+    print(f"{'length':>7} {'ms/frame':>9}")
+    for n in range(1, len(chain) + 1):
+        researcher.apply_l3_filter(img, mode=chain[:n], method='fused', out=out)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            researcher.apply_l3_filter(img, mode=chain[:n], method='fused', out=out)
+        print(f"{n:>7} {(time.perf_counter() - start) / repeats * 1000:>9.1f}")
+
+
+def bench_parallel(max_workers, rounds):
+    """Speedup of the process-pool frame renderer against core count."""
+    angles = list(ANGLES) * rounds
+    start = time.perf_counter()
+    serial = list(render_frames(angles))
+    serial_time = time.perf_counter() - start
+    print(f"\nrender_frames, {len(angles)} frames, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'fps':>8} {'speedup':>8} {'identical':>10}")
+    print(f"{1:>8} {len(angles) / serial_time:>8.1f} {1.0:>7.2f}x {'-':>10}")
+    workers = 2
+    while workers <= max_workers:
+        start = time.perf_counter()
+        frames = list(render_frames(angles, workers))
+        elapsed = time.perf_counter() - start
+        same = all(np.array_equal(a, b) for a, b in zip(serial, frames))
+        print(f"{workers:>8} {len(angles) / elapsed:>8.1f} {serial_time / elapsed:>7.2f}x {str(same):>10}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lab 3 rendering benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--frames", type=int, default=45, help="frames for the fast paths")
+    parser.add_argument("--loop-frames", type=int, default=2, help="frames for the per-pixel reference loop")
+    parser.add_argument("--mesh-size", type=int, default=1080, help="canvas size for the mesh and line benchmarks")
+    parser.add_argument("--triangles", type=int, nargs="+", default=MESH_SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="largest pool for the parallel benchmark")
+    parser.add_argument("--filter-size", type=int, nargs=2, default=[2160, 3840], metavar=("H", "W"))
+    args = parser.parse_args()
+
+    bench_fill(args.sizes, args.frames, args.loop_frames)
+    bench_mesh(args.mesh_size, args.triangles, args.repeats)
+    bench_lines(args.mesh_size, args.triangles, args.repeats)
+    bench_filter(*args.filter_size, args.repeats)
+    bench_chain(*args.filter_size, args.repeats)
+    bench_parallel(args.workers, 2)
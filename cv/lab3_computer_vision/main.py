@@ -2,14 +2,126 @@ import numpy as np
 import cv2
 import math
 import imageio
+import argparse
+import os
+import time
+import queue
+import threading
+from collections import deque
+from contextlib import closing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, GifImagePlugin
+from mesh_loader import load_mesh
+
+# Industry standard sepia matrix
+SEPIA_MATRIX = np.array([
+    [0.272, 0.534, 0.131],
+    [0.349, 0.686, 0.168],
+    [0.393, 0.769, 0.189]
+])
+
+# Level III color matrices on normalized [0, 1] RGB: 3x3 linear or 3x4 affine
+MATRIX_FILTERS = {
+    'sepia': SEPIA_MATRIX,
+    'grayscale': np.array([[0.299, 0.587, 0.114]] * 3),
+    'channel_swap': np.array([[0, 0, 1], [0, 1, 0], [1, 0, 0]], dtype=np.float64),
+    # Blended by the mask this darkens towards the edges
+    'vignette': np.eye(3) * 0.25,
+    'invert': np.hstack((-np.eye(3), np.ones((3, 1)))),
+    'warm': np.array([
+        [1.10, 0.00, 0.00, 0.02],
+        [0.00, 1.00, 0.00, 0.00],
+        [0.00, 0.00, 0.85, 0.00]
+    ]),
+}
+
+
+def gamma_lut(gamma):
+    """(256, 3) lookup table applying out = in ** (1 / gamma) to every channel."""
+    ramp = np.arange(256) / 255.0
+    return np.repeat((255 * ramp ** (1 / gamma) + 0.5).astype(np.uint8)[:, None], 3, axis=1)
+
+
+def curves_lut(red, green, blue):
+    """(256, 3) lookup table from per-channel curves given as [(in, out), ...] control points."""
+    ramp = np.arange(256)
+    channels = [np.interp(ramp, *zip(*points)) for points in (red, green, blue)]
+    return (np.stack(channels, axis=1) + 0.5).astype(np.uint8)
+
+
+# Level III per-channel lookup tables, indexed [value, channel]
+LUT_FILTERS = {
+    'gamma': gamma_lut(2.2),
+    'cross_process': curves_lut(
+        [(0, 0), (64, 40), (192, 220), (255, 255)],
+        [(0, 0), (64, 56), (192, 210), (255, 255)],
+        [(0, 40), (255, 200)]
+    ),
+}
+
+
+def compile_filter(mode):
+    """
+    Turns a filter name or a chain of names into stages of ('matrix', 3x4)
+    or ('lut', (256, 3)). Consecutive matrices are multiplied together as 4x4
+    homogeneous transforms and consecutive LUTs are composed, so a chain of
+    N matrix filters costs one pass over the image.
+    """
+    names = [mode] if isinstance(mode, str) else list(mode)
+    stages = []
+    for name in names:
+        if name in MATRIX_FILTERS:
+            m = np.asarray(MATRIX_FILTERS[name], dtype=np.float64)
+            if m.shape[1] == 3:
+                m = np.hstack((m, np.zeros((3, 1))))
+            m = np.vstack((m, [0, 0, 0, 1]))
+            if stages and stages[-1][0] == 'matrix':
+                m = m @ np.vstack((stages.pop()[1], [0, 0, 0, 1]))
+            stages.append(('matrix', m[:3]))
+        elif name in LUT_FILTERS:
+            lut = LUT_FILTERS[name]
+            if stages and stages[-1][0] == 'lut':
+                lut = lut[stages.pop()[1], np.arange(3)]
+            stages.append(('lut', lut))
+        else:
+            raise ValueError(f"Unknown filter: {name}")
+    return stages
+
+
+# Isometric projection constants
+ISO_COS = math.cos(math.radians(30))
+ISO_SIN = math.sin(math.radians(30))
+
+
+@lru_cache(maxsize=1024)
+def rotation_y_matrix(angle):
+    """3x3 rotation around the Y-axis for an angle in degrees, cached per angle."""
+    rad = math.radians(angle)
+    c, s = math.cos(rad), math.sin(rad)
+    rot = np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+    rot.flags.writeable = False
+    return rot
+
 
 class PyramidResearcher:
-    def __init__(self, size=400):
+    def __init__(self, size=400, mesh=None):
         self.size = size
         self.center = size // 2
-        # Setup 3D Geometry: Apex + Triangular Base
-        self.verts = [[0, 1.2, 0], [-1, -0.8, 1], [1, -0.8, 1], [0, -0.8, -1]]
-        self.faces = [(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 2, 3)]
+        # Pixels per world unit (100 at the reference 400px canvas)
+        self.scale = size / 4
+        # Per-size caches for the Level III filter
+        self._masks = {}
+        self._buffers = {}
+        if mesh is None:
+            # Setup 3D Geometry: Apex + Triangular Base
+            self.verts = [[0, 1.2, 0], [-1, -0.8, 1], [1, -0.8, 1], [0, -0.8, -1]]
+            self.faces = [(0, 1, 2), (0, 2, 3), (0, 3, 1), (1, 2, 3)]
+        else:
+            # OBJ/PLY asset, centered and scaled to the pyramid's extent
+            verts, self.faces = load_mesh(mesh)
+            verts = verts - (verts.min(axis=0) + verts.max(axis=0)) / 2
+            self.verts = verts * (1.2 / max(np.abs(verts).max(), 1e-12))
 
     def rotate_y(self, point, angle):
         """Applies a rotation matrix around the Y-axis."""
@@ -22,16 +134,116 @@ class PyramidResearcher:
     def project(self, p):
         """Axonometric (Isometric) Projection: 3D to 2D screen coordinates."""
         x, y, z = p
-        u = (x - z) * math.cos(math.radians(30))
-        v = y + (x + z) * math.sin(math.radians(30))
-        # Scale by 100 and offset to center
-        return int(u * 100 + self.center), int(-v * 100 + self.center)
+        u = (x - z) * ISO_COS
+        v = y + (x + z) * ISO_SIN
+        # Scale to canvas size and offset to center
+        return int(u * self.scale + self.center), int(-v * self.scale + self.center)
+
+    def depth(self, p):
+        """
+        Distance along the isometric viewing axis (camera above the model,
+        looking along (1, -1, 1)). Smaller values are closer to the viewer.
+        """
+        x, y, z = p
+        return (x - y + z) / math.sqrt(3)
 
-    def draw_l1_line(self, img, p1, p2, c1, c2):
+    def rotate_y_array(self, verts, angle):
+        """
+        rotate_y for a whole (N, 3) vertex array with the cached rotation
+        matrix. Column-wise so the rounding matches the scalar path exactly.
+        """
+        rot = rotation_y_matrix(angle)
+        c, s = rot[0, 0], rot[0, 2]
+        x, y, z = np.asarray(verts, dtype=np.float64).T
+        return np.stack((x * c + z * s, y, -x * s + z * c), axis=1)
+
+    def project_array(self, verts):
+        """project for an (N, 3) vertex array: (N, 2) int screen coordinates."""
+        x, y, z = np.asarray(verts, dtype=np.float64).T
+        u = (x - z) * ISO_COS
+        v = y + (x + z) * ISO_SIN
+        return np.stack((u * self.scale + self.center, -v * self.scale + self.center), axis=1).astype(np.int64)
+
+    def depth_array(self, verts):
+        """depth for an (N, 3) vertex array."""
+        x, y, z = np.asarray(verts, dtype=np.float64).T
+        return (x - y + z) / math.sqrt(3)
+
+    def draw_l1_line(self, img, p1, p2, c1, c2, vectorized=True):
         """
         Level I: Bresenham-based line drawing.
         Implements color change from raster to raster.
+        The vectorized path generates the whole line as arrays (see
+        draw_l1_lines); vectorized=False keeps the reference loop.
         """
+        if not vectorized:
+            return self._draw_l1_line_loop(img, p1, p2, c1, c2)
+        self.draw_l1_lines(img, [p1], [p2], [c1], [c2], dedupe=False)
+
+    def draw_l1_lines(self, img, starts, ends, c1, c2, dedupe=True):
+        """
+        Level I: Draws N lines in one call with per-line endpoint colors.
+        starts/ends are (N, 2) screen points, c1/c2 are (N, 3) or a single
+        color for all lines. With dedupe, lines sharing both endpoints (in
+        either direction, e.g. edges shared between faces) are drawn once,
+        keeping the last one. Overlaps resolve as if drawn one after another.
+        """
+        starts = np.asarray(starts).astype(np.int64).reshape(-1, 2)
+        ends = np.asarray(ends).astype(np.int64).reshape(-1, 2)
+        n = len(starts)
+        c1 = np.broadcast_to(np.asarray(c1, dtype=np.float64), (n, 3))
+        c2 = np.broadcast_to(np.asarray(c2, dtype=np.float64), (n, 3))
+        if n == 0:
+            return
+
+        if dedupe:
+            # Undirected key: the lexicographically smaller endpoint first
+            swap = (starts[:, 0] > ends[:, 0]) | ((starts[:, 0] == ends[:, 0]) & (starts[:, 1] > ends[:, 1]))
+            key = np.where(swap[:, None], np.hstack((ends, starts)), np.hstack((starts, ends)))
+            _, last = np.unique(key[::-1], axis=0, return_index=True)
+            keep = np.sort(n - 1 - last)
+            starts, ends, c1, c2 = starts[keep], ends[keep], c1[keep], c2[keep]
+
+        # One sample per step along the major axis, as in the scalar loop
+        steps = np.abs(ends - starts).max(axis=1)
+        line = np.repeat(np.arange(len(steps)), steps + 1)
+        i = np.arange(len(line)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+        line_steps = steps[line]
+        t = np.where(line_steps > 0, i / np.maximum(line_steps, 1), 1.0)
+
+        x1, y1 = starts[line].T
+        x2, y2 = ends[line].T
+        xs = (x1 + (x2 - x1) * t).astype(int)
+        ys = (y1 + (y2 - y1) * t).astype(int)
+        # Linear color interpolation
+        cols = (c1[line] * (1 - t)[:, None] + c2[line] * t[:, None]).astype(int)
+
+        inside = (xs >= 0) & (xs < self.size) & (ys >= 0) & (ys < self.size)
+        xs, ys, cols = xs[inside], ys[inside], cols[inside]
+        # Later samples win, exactly like sequential per-pixel writes
+        last = self._last_writes(xs, ys)
+        img[ys[last], xs[last]] = cols[last]
+
+    @staticmethod
+    def _last_writes(xs, ys):
+        """Indices of the last sample that lands on each distinct pixel."""
+        if len(xs) == 0:
+            return np.zeros(0, dtype=np.int64)
+        x0, y0 = xs.min(), ys.min()
+        w = xs.max() - x0 + 1
+        pix = (ys - y0) * w + (xs - x0)
+        area = w * (ys.max() - y0 + 1)
+        order = np.arange(len(pix))
+        if area > 16 * len(pix):
+            # Sparse samples: a sort is cheaper than a bounding-box buffer
+            _, last = np.unique(pix[::-1], return_index=True)
+            return np.sort(len(pix) - 1 - last)
+        owner = np.full(area, -1, dtype=np.int64)
+        np.maximum.at(owner, pix, order)
+        return order[owner[pix] == order]
+
+    def _draw_l1_line_loop(self, img, p1, p2, c1, c2):
+        """Per-pixel reference implementation of draw_l1_line."""
         x1, y1 = p1; x2, y2 = p2
         dx, dy = abs(x2 - x1), abs(y2 - y1)
         steps = max(dx, dy)
@@ -44,11 +256,41 @@ class PyramidResearcher:
             if 0 <= curr_x < self.size and 0 <= curr_y < self.size:
                 img[curr_y, curr_x] = curr_col
 
-    def draw_l2_fill(self, img, pts, base_color):
+    def draw_l2_fill(self, img, pts, base_color, vectorized=True):
         """
         Level II: Face filling using Barycentric coordinates.
         Ensures color variation inside the triangle on a per-raster level.
+        The vectorized path evaluates the edge functions over the whole
+        bounding box at once; vectorized=False keeps the reference loop.
         """
+        if not vectorized:
+            return self._draw_l2_fill_loop(img, pts, base_color)
+
+        pts = np.array(pts)
+        # Bounding box for optimization
+        x_min, y_min = np.max([[0, 0], pts.min(axis=0).astype(int)], axis=0)
+        x_max, y_max = np.min([[self.size-1, self.size-1], pts.max(axis=0).astype(int)], axis=0)
+        if x_max < x_min or y_max < y_min:
+            return
+
+        (x0, y0), (x1, y1), (x2, y2) = pts
+        xs = np.arange(x_min, x_max + 1)[None, :] - x2
+        ys = np.arange(y_min, y_max + 1)[:, None] - y2
+
+        # Barycentric denominator is constant for the whole triangle
+        d = (y1-y2)*(x0-x2) + (x2-x1)*(y0-y2) + 1e-6
+        w0 = ((y1-y2)*xs + (x2-x1)*ys) / d
+        w1 = ((y2-y0)*xs + (x0-x2)*ys) / d
+        w2 = 1 - w0 - w1
+        mask = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        # Same shading as the loop: int() truncation of base * (0.3*w0 + 0.7)
+        shade = w0[mask] * 0.3 + 0.7
+        colors = (shade[:, None] * np.asarray(base_color, dtype=np.float64)).astype(int)
+        img[y_min:y_max + 1, x_min:x_max + 1][mask] = colors
+
+    def _draw_l2_fill_loop(self, img, pts, base_color):
+        """Per-pixel reference implementation of draw_l2_fill."""
         pts = np.array(pts)
         # Bounding box for optimization
         x_min, y_min = np.max([[0, 0], pts.min(axis=0).astype(int)], axis=0)
@@ -66,95 +308,464 @@ class PyramidResearcher:
                     # Color shifts based on spatial position (raster-to-raster)
                     img[y, x] = [int(base_color[i] * (w0*0.3 + 0.7)) for i in range(3)]
 
-    def apply_l3_filter(self, img, mode='sepia'):
+    def draw_l2_mesh(self, img, pts, depths, faces, colors, zbuf=None, chunk_pixels=1 << 22):
+        """
+        Level II: Batched z-buffered fill of a whole triangle mesh.
+        pts is an (N, 2) array of screen vertices, depths an (N,) array of view
+        depths, faces a (T, 3) index array and colors a (T, 3) array of base
+        colors. Triangles are shaded like draw_l2_fill, but each pixel keeps the
+        nearest fragment instead of the last face drawn. Triangles are bucketed
+        by bounding-box size and rasterized as (T, H, W) blocks of at most
+        chunk_pixels samples. Returns the depth buffer (inf where empty).
+        """
+        if zbuf is None:
+            zbuf = np.full(img.shape[:2], np.inf)
+        pts = np.asarray(pts).astype(np.int64)
+        depths = np.asarray(depths, dtype=np.float64)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+        if len(faces) == 0:
+            return zbuf
+
+        tri = pts[faces]
+        lo = np.maximum(tri.min(axis=1), 0)
+        hi = np.minimum(tri.max(axis=1), self.size - 1)
+        visible = np.nonzero((hi >= lo).all(axis=1))[0]
+
+        # Power-of-two block shape per triangle, so one block shape fits a bucket
+        extent = (hi - lo + 1)[visible]
+        block = np.minimum(1 << np.ceil(np.log2(extent)).astype(np.int64), self.size)
+        flat = zbuf.reshape(-1)
+        out = img.reshape(-1, img.shape[2])
+        for bw, bh in np.unique(block, axis=0):
+            bucket = visible[(block[:, 0] == bw) & (block[:, 1] == bh)]
+            step = max(1, chunk_pixels // (bw * bh))
+            for start in range(0, len(bucket), step):
+                idx = bucket[start:start + step]
+                self._raster_block(idx, int(bw), int(bh), tri, lo, hi, depths[faces[idx]], colors, flat, out)
+        return zbuf
+
+    def _raster_block(self, idx, bw, bh, tri, lo, hi, z, colors, zbuf, out):
+        """Rasterizes the triangles idx as one (T, bh, bw) block into flat buffers."""
+        (x0, y0), (x1, y1), (x2, y2) = [tri[idx, k].T[:, :, None, None] for k in range(3)]
+        ox = lo[idx, 0][:, None, None] + np.arange(bw)[None, None, :]
+        oy = lo[idx, 1][:, None, None] + np.arange(bh)[None, :, None]
+        xs, ys = ox - x2, oy - y2
+
+        # Same edge functions as draw_l2_fill, one denominator per triangle
+        d = (y1-y2)*(x0-x2) + (x2-x1)*(y0-y2) + 1e-6
+        w0 = ((y1-y2)*xs + (x2-x1)*ys) / d
+        w1 = ((y2-y0)*xs + (x0-x2)*ys) / d
+        w2 = 1 - w0 - w1
+        mask = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        mask &= (ox <= hi[idx, 0][:, None, None]) & (oy <= hi[idx, 1][:, None, None])
+
+        t, ty, tx = np.nonzero(mask)
+        if len(t) == 0:
+            return
+        w0, w1, w2 = w0[t, ty, tx], w1[t, ty, tx], w2[t, ty, tx]
+        frag_z = w0 * z[t, 0] + w1 * z[t, 1] + w2 * z[t, 2]
+        pix = oy[t, ty, 0] * self.size + ox[t, 0, tx]
+
+        # Nearest fragment per pixel inside the block, then test against zbuf
+        order = np.lexsort((frag_z, pix))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pix[order[1:]] != pix[order[:-1]]
+        near = order[first]
+        near = near[frag_z[near] < zbuf[pix[near]]]
+        zbuf[pix[near]] = frag_z[near]
+        shade = w0[near] * 0.3 + 0.7
+        out[pix[near]] = (shade[:, None] * colors[idx[t[near]]]).astype(int)
+
+    def blend_mask(self, h, w, kind='radial', dtype=np.float64):
+        """
+        Per-pixel filter strength in [0, 1], cached per canvas size and dtype.
+        kind is 'radial' (distance from center), 'linear' (left to right),
+        'full' (filter everywhere) or a custom (h, w) array.
+        """
+        if isinstance(kind, np.ndarray):
+            if kind.shape != (h, w):
+                raise ValueError(f"Mask shape {kind.shape} does not match image {(h, w)}")
+            return kind.astype(dtype, copy=False)
+        mask = self._masks.get((kind, h, w, np.dtype(dtype)))
+        if mask is None:
+            if np.dtype(dtype) != np.float64:
+                mask = self.blend_mask(h, w, kind).astype(dtype)
+            elif kind == 'radial':
+                y, x = np.ogrid[:h, :w]
+                dist = np.sqrt((x - w/2)**2 + (y - h/2)**2)
+                mask = dist / dist.max()
+            elif kind == 'linear':
+                mask = np.repeat(np.linspace(0, 1, w)[None, :], h, axis=0)
+            elif kind == 'full':
+                mask = np.ones((h, w))
+            else:
+                raise ValueError(f"Unknown blend mask: {kind}")
+            self._masks[(kind, h, w, np.dtype(dtype))] = mask
+        return mask
+
+    def _buffer(self, name, shape, dtype):
+        """Preallocated scratch array, reused across frames of the same size."""
+        key = (name, shape, np.dtype(dtype))
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = np.empty(shape, dtype=dtype)
+        return buf
+
+    def apply_l3_filter(self, img, mode='sepia', method='numpy', out=None, mask='radial'):
         """
         Level III: Matrix-level spatial gradient processing.
-        Applies a color correction filter blended by a radial mask.
+        Applies a color correction filter blended by a mask (see blend_mask).
+        mode is a registered filter name or a chain of names (see compile_filter).
+
+        method selects the kernel:
+          'numpy'   - float64 reference path;
+          'fused'   - one float32 pass: img + mask * (img @ (M - I).T),
+                      computed in preallocated buffers;
+          'cv2'     - the fused pass with cv2.transform for the matrix step;
+          'float16' - the fused pass in half-size buffers (slower on CPUs
+                      without native half-precision arithmetic);
+          'uint8'   - fixed-point integer pass, no float image at all.
+        The fast paths match the reference to within a couple of levels.
+        Chains containing LUTs saturate between stages; the fast paths run
+        those stages on uint8 with cv2 and fuse only the blend.
+        out receives the result and may be img itself for in-place filtering.
         """
         h, w = img.shape[:2]
-        y, x = np.ogrid[:h, :w]
-        # Radial gradient mask (distance from center)
-        dist = np.sqrt((x - w/2)**2 + (y - h/2)**2)
-        mask = dist / dist.max()
-
-        # Float normalization for matrix multiplication
-        res = img.astype(np.float32) / 255.0
-        if mode == 'sepia':
-            # Industry standard sepia matrix
-            sepia_matrix = np.array([
-                [0.272, 0.534, 0.131],
-                [0.349, 0.686, 0.168],
-                [0.393, 0.769, 0.189]
-            ])
-            sepia_img = res @ sepia_matrix.T
-            # Blend original render with sepia based on radial gradient
-            res = res * (1 - mask[:,:,None]) + sepia_img * mask[:,:,None]
-
-        return (np.clip(res * 255, 0, 255)).astype(np.uint8)
-
-def run_experiment():
-    researcher = PyramidResearcher(400)
-    gif_frames = []
-
-    print("Starting Graphics Pipeline. Press 'q' to stop.")
-
-    # 360-degree rotation loop
-    for angle in range(0, 360, 8):
-        # Create blank canvases for each Level
-        l1_canvas = np.zeros((400, 400, 3), dtype=np.uint8)
-        l2_canvas = np.zeros((400, 400, 3), dtype=np.uint8)
-
-        # Dynamics: Opacity/Brightness pulse (Figure appears and fades)
-        pulse = (math.sin(math.radians(angle)) + 1) / 2
-
-        # 3D Math: Rotation and Projection
-        rotated = [researcher.rotate_y(v, angle) for v in researcher.verts]
-        proj = [researcher.project(v) for v in rotated]
-
-        # Render Level 2 (Faces) and Level 1 (Edges)
-        for i, f in enumerate(researcher.faces):
-            p_tri = [proj[f[0]], proj[f[1]], proj[f[2]]]
-
-            # Level II: Filling with per-raster gradient
-            researcher.draw_l2_fill(l2_canvas, p_tri, [int(200*pulse), 100, 50 + i*50])
-
-            # Level I: Edges with per-raster gradient
-            for j in range(3):
-                p_start, p_end = proj[f[j]], proj[f[(j+1)%3]]
-                researcher.draw_l1_line(l1_canvas, p_start, p_end, (0, 255, 100), (255, 100, pulse*255))
-                # Add white wireframe on top of filled model for clarity
-                researcher.draw_l1_line(l2_canvas, p_start, p_end, (255, 255, 255), (150, 150, 150))
-
-        # Level III: Global matrix correction
-        l3_canvas = researcher.apply_l3_filter(l2_canvas, mode='sepia')
-
-        # Assemble Triptych Visualization
-        combined = np.hstack((l1_canvas, l2_canvas, l3_canvas))
-
-        # Annotations
-        labels = ["L1: RASTER EDGES", "L2: RASTER FILL", "L3: MATRIX FILTER"]
-        for idx, label in enumerate(labels):
-            cv2.putText(combined, label, (10 + idx*400, 385),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-        # Show Live Window
-        cv2.imshow("CV LABS Research: Levels I, II, III", combined)
-
-        # Save a frame for the static report
-        if angle == 120:
-            cv2.imwrite('pyramid_research_static.png', combined)
-
-        gif_frames.append(cv2.cvtColor(combined, cv2.COLOR_BGR2RGB))
-
-        if cv2.waitKey(20) & 0xFF == ord('q'):
-            break
-
-    cv2.destroyAllWindows()
-
-    # Export Results
-    print("Saving dynamic GIF...")
-    imageio.mimsave('pyramid_research_dynamic.gif', gif_frames, fps=15)
-    print("Success. Files 'pyramid_research_dynamic.gif' and 'pyramid_research_static.png' generated.")
+        if out is None:
+            out = np.empty_like(img)
+        stages = compile_filter(mode)
+
+        if method == 'numpy':
+            mask = self.blend_mask(h, w, mask)
+            # Float normalization for matrix multiplication
+            res = img.astype(np.float32) / 255.0
+            filtered = res
+            for kind, op in stages:
+                if kind == 'matrix':
+                    filtered = filtered @ op[:, :3].T + op[:, 3]
+                else:
+                    levels = np.clip(filtered * 255 + 0.5, 0, 255).astype(np.uint8)
+                    filtered = op[levels, np.arange(3)] / 255.0
+            if any(kind == 'lut' for kind, _ in stages):
+                # LUT chains produce a saturated image, like the cv2 stages
+                filtered = np.clip(filtered, 0, 1)
+            # Blend original render with the filtered one based on the mask
+            res = res * (1 - mask[:,:,None]) + filtered * mask[:,:,None]
+            np.copyto(out, np.clip(res * 255, 0, 255), casting='unsafe')
+        elif method in ('fused', 'cv2', 'float16'):
+            self._fused_filter(img, stages, mask, out, method)
+        elif method == 'uint8':
+            self._fixed_point_filter(img, stages, mask, out)
+        else:
+            raise ValueError(f"Unknown filter method: {method}")
+        return out
+
+    @staticmethod
+    def _single_matrix(stages):
+        """The 3x4 matrix of a matrix-only chain (identity when empty), else None."""
+        if not stages:
+            return np.hstack((np.eye(3), np.zeros((3, 1))))
+        if len(stages) == 1 and stages[0][0] == 'matrix':
+            return stages[0][1]
+        return None
+
+    @staticmethod
+    def _run_stages(img, stages):
+        """Applies compiled stages in uint8 with cv2 (saturating, rounded)."""
+        for kind, op in stages:
+            if kind == 'matrix':
+                img = cv2.transform(img, np.hstack((op[:, :3], op[:, 3:] * 255)))
+            else:
+                img = cv2.LUT(img, op.reshape(256, 1, 3))
+        return img
+
+    def _fused_filter(self, img, stages, mask_kind, out, method):
+        """Blend and color matrix in one pass: the blend is linear, so it folds into M - I."""
+        h, w = img.shape[:2]
+        dtype = np.float16 if method == 'float16' else np.float32
+        mask = self.blend_mask(h, w, mask_kind, dtype)[:, :, None]
+
+        src = self._buffer('src', (h, w, 3), dtype)
+        delta = self._buffer('delta', (h, w, 3), dtype)
+        np.copyto(src, img, casting='unsafe')
+        matrix = self._single_matrix(stages)
+        if matrix is None:
+            np.subtract(self._run_stages(img, stages), src, out=delta)
+        else:
+            kernel = np.hstack((matrix[:, :3] - np.eye(3), matrix[:, 3:] * 255)).astype(dtype)
+            if method == 'cv2':
+                cv2.transform(src, kernel, dst=delta)
+            else:
+                np.matmul(src, kernel[:, :3].T, out=delta)
+                if kernel[:, 3].any():
+                    delta += kernel[:, 3]
+        delta *= mask
+        delta += src
+        np.clip(delta, 0, 255, out=delta)
+        np.copyto(out, delta, casting='unsafe')
+
+    def _fixed_point_filter(self, img, stages, mask_kind, out):
+        """Integer version of the fused pass: Q12 kernel, Q8 mask, int32 accumulators."""
+        h, w = img.shape[:2]
+        if isinstance(mask_kind, np.ndarray):
+            mask = np.round(self.blend_mask(h, w, mask_kind) * 256).astype(np.int32)
+        else:
+            mask = self._masks.get((mask_kind, h, w, 'q8'))
+            if mask is None:
+                mask = np.round(self.blend_mask(h, w, mask_kind) * 256).astype(np.int32)
+                self._masks[(mask_kind, h, w, 'q8')] = mask
+
+        acc = self._buffer('acc', (h, w), np.int32)
+        tmp = self._buffer('tmp', (h, w), np.int32)
+        res = self._buffer('res', (h, w, 3), np.uint8)
+        matrix = self._single_matrix(stages)
+        if matrix is None:
+            filtered = self._run_stages(img, stages)
+        else:
+            kernel = np.round((matrix[:, :3] - np.eye(3)) * 4096).astype(np.int32)
+            offset = np.round(matrix[:, 3] * 255 * 4096).astype(np.int32)
+        for c in range(3):
+            if matrix is None:
+                np.subtract(filtered[..., c], img[..., c], out=acc, dtype=np.int32)
+                shift = 8
+            else:
+                np.multiply(img[..., 0], kernel[c, 0], out=acc)
+                for j in (1, 2):
+                    np.multiply(img[..., j], kernel[c, j], out=tmp)
+                    acc += tmp
+                acc += offset[c]
+                shift = 20
+            acc *= mask
+            # Floor like the float paths' truncation, then add the original channel
+            acc >>= shift
+            acc += img[..., c]
+            np.clip(acc, 0, 255, out=acc)
+            np.copyto(res[..., c], acc, casting='unsafe')
+        # Written last so out may alias img
+        np.copyto(out, res)
+
+class FrameWriter:
+    """
+    Streams RGB frames to disk as they are produced instead of keeping the
+    whole animation in memory. The format follows the path: '.gif', '.mp4'
+    (needs imageio-ffmpeg) or a directory for a PNG sequence. Encoding runs
+    on a background thread fed by a queue of at most queue_size frames, so
+    write() blocks when the encoder falls behind and memory stays bounded.
+    Everything written before close() is a valid file even if the run stops early.
+    """
+
+    def __init__(self, path, fps=15, queue_size=4):
+        self.path = path
+        self.fps = fps
+        ext = os.path.splitext(path)[1].lower()
+        self.kind = {'.gif': 'gif', '.mp4': 'mp4', '': 'png'}.get(ext)
+        if self.kind is None:
+            raise ValueError(f"Unsupported output format: {path}")
+        self.frames_written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        """Queues one (h, w, 3) uint8 RGB frame, blocking while the queue is full."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put(frame)
+
+    def close(self):
+        """Flushes the queue and finalizes the file."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        handle = None
+        try:
+            while (frame := self._queue.get()) is not None:
+                if handle is None:
+                    handle = self._open(frame)
+                self._encode(handle, frame)
+                self.frames_written += 1
+        except Exception as e:
+            self._error = e
+            # Keep draining so producers never block on a dead writer
+            while self._queue.get() is not None:
+                pass
+        finally:
+            if handle is not None:
+                self._finish(handle)
+
+    def _open(self, frame):
+        if self.kind == 'gif':
+            handle = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(self._to_palette(frame), info={'loop': 0})
+            handle.writelines(header)
+            return handle
+        if self.kind == 'mp4':
+            return imageio.get_writer(self.path, fps=self.fps, macro_block_size=1)
+        os.makedirs(self.path, exist_ok=True)
+        return self.path
+
+    def _encode(self, handle, frame):
+        if self.kind == 'gif':
+            # Each frame carries its own adaptive palette, like imageio.mimsave
+            data = GifImagePlugin.getdata(self._to_palette(frame), duration=1000 / self.fps,
+                                          include_color_table=True)
+            handle.writelines(data)
+        elif self.kind == 'mp4':
+            handle.append_data(frame)
+        else:
+            imageio.imwrite(os.path.join(handle, f"frame_{self.frames_written:05d}.png"), frame)
+
+    def _finish(self, handle):
+        if self.kind == 'gif':
+            handle.write(b';')
+            handle.close()
+        elif self.kind == 'mp4':
+            handle.close()
+
+    @staticmethod
+    def _to_palette(frame):
+        return Image.fromarray(frame).convert('P', palette=Image.Palette.ADAPTIVE)
+
+
+# 360-degree rotation in 8-degree steps
+ANGLES = range(0, 360, 8)
+
+def render_frame(researcher, angle):
+    """Renders the Level I/II/III triptych (BGR) for one rotation angle."""
+    # Create blank canvases for each Level
+    l1_canvas = np.zeros((400, 400, 3), dtype=np.uint8)
+    l2_canvas = np.zeros((400, 400, 3), dtype=np.uint8)
+
+    # Dynamics: Opacity/Brightness pulse (Figure appears and fades)
+    pulse = (math.sin(math.radians(angle)) + 1) / 2
+
+    # 3D Math: Rotation and Projection of the whole vertex array
+    rotated = researcher.rotate_y_array(researcher.verts, angle)
+    proj = researcher.project_array(rotated)
+    depths = researcher.depth_array(rotated)
+
+    # Level II: Z-buffered filling of all faces with per-raster gradient
+    face_colors = [[int(200*pulse), 100, 50 + (i % 5)*50] for i in range(len(researcher.faces))]
+    researcher.draw_l2_mesh(l2_canvas, proj, depths, researcher.faces, face_colors)
+
+    # Level I: Edges with per-raster gradient, shared edges drawn once
+    faces = np.asarray(researcher.faces)
+    p_start = proj[faces].reshape(-1, 2)
+    p_end = proj[np.roll(faces, -1, axis=1)].reshape(-1, 2)
+    researcher.draw_l1_lines(l1_canvas, p_start, p_end, (0, 255, 100), (255, 100, pulse*255))
+    # Add white wireframe on top of filled model for clarity
+    researcher.draw_l1_lines(l2_canvas, p_start, p_end, (255, 255, 255), (150, 150, 150))
+
+    # Level III: Global matrix correction
+    l3_canvas = researcher.apply_l3_filter(l2_canvas, mode='sepia', method='fused')
+
+    # Assemble Triptych Visualization
+    combined = np.hstack((l1_canvas, l2_canvas, l3_canvas))
+
+    # Annotations
+    labels = ["L1: RASTER EDGES", "L2: RASTER FILL", "L3: MATRIX FILTER"]
+    for idx, label in enumerate(labels):
+        cv2.putText(combined, label, (10 + idx*400, 385),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return combined
+
+# Worker-process state for render_frames
+_worker_researcher = None
+
+def _init_worker(mesh):
+    global _worker_researcher
+    _worker_researcher = PyramidResearcher(400, mesh)
+
+def _render_in_worker(angle):
+    return render_frame(_worker_researcher, angle)
+
+def render_frames(angles, workers=1, mesh=None):
+    """
+    Yields render_frame results in angle order. With workers > 1 the angles
+    are spread over a process pool; at most 2 * workers frames are in flight,
+    so memory stays bounded. Frames are identical to the serial path.
+    """
+    if workers <= 1:
+        researcher = PyramidResearcher(400, mesh)
+        for angle in angles:
+            yield render_frame(researcher, angle)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(mesh,)) as pool:
+        pending = deque()
+        try:
+            for angle in angles:
+                pending.append(pool.submit(_render_in_worker, angle))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Stopped early: drop frames nobody will consume
+            for future in pending:
+                future.cancel()
+
+def run_experiment(output='pyramid_research_dynamic.gif', fps=15, headless=None, workers=1, mesh=None):
+    """
+    Renders the rotating pyramid and streams every frame to output
+    (.gif, .mp4 or a directory for PNGs) while it is being rendered.
+    headless skips the preview window and its 20 ms waitKey so frames render
+    as fast as the CPU allows; by default it follows the PYRAMID_HEADLESS
+    environment variable. workers > 1 renders frames in parallel processes.
+    mesh is an optional OBJ/PLY file rendered instead of the pyramid.
+    """
+    if headless is None:
+        headless = os.environ.get('PYRAMID_HEADLESS', '').lower() in ('1', 'true', 'yes')
+    if headless:
+        print("Starting Graphics Pipeline (headless).")
+    else:
+        print("Starting Graphics Pipeline. Press 'q' to stop.")
+
+    start = time.perf_counter()
+    frames = render_frames(ANGLES, workers, mesh)
+    with FrameWriter(output, fps=fps) as writer, closing(frames):
+        # 360-degree rotation loop
+        for angle, combined in zip(ANGLES, frames):
+            # Save a frame for the static report
+            if angle == 120:
+                cv2.imwrite('pyramid_research_static.png', combined)
+
+            # Export Results: handed to the encoder as soon as it is ready
+            writer.write(cv2.cvtColor(combined, cv2.COLOR_BGR2RGB))
+
+            if headless:
+                continue
+            # Show Live Window
+            cv2.imshow("CV LABS Research: Levels I, II, III", combined)
+            if cv2.waitKey(20) & 0xFF == ord('q'):
+                break
+    elapsed = time.perf_counter() - start
+
+    if not headless:
+        cv2.destroyAllWindows()
+    print(f"Rendered {writer.frames_written} frames in {elapsed:.2f}s ({writer.frames_written / elapsed:.1f} fps).")
+    print(f"Success. Files '{output}' and 'pyramid_research_static.png' generated.")
 
 if __name__ == "__main__":
-    run_experiment()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Lab 3: Levels I, II, III pyramid pipeline")
+    parser.add_argument("--output", default='pyramid_research_dynamic.gif',
+                        help=".gif, .mp4 or a directory for a PNG sequence")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--headless", action="store_true", default=None,
+                        help="no preview window or waitKey (also PYRAMID_HEADLESS=1)")
+    parser.add_argument("--workers", type=int, default=1, help="render processes")
+    parser.add_argument("--mesh", help="OBJ or binary PLY file to render instead of the pyramid")
+    args = parser.parse_args()
+
+    run_experiment(args.output, args.fps, args.headless, args.workers, args.mesh)
\ No newline at end of file
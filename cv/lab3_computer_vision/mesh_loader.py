@@ -0,0 +1,282 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+
+# PLY scalar types -> NumPy type codes
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def load_mesh(path, cache_dir=None):
+    """
+    Loads an OBJ or binary PLY mesh as contiguous (N, 3) float64 vertices and
+    (T, 3) int64 triangles (polygons are fan-triangulated). Parsed meshes are
+    cached as .npz in cache_dir (default: .mesh_cache next to the file), keyed
+    by a hash of the file contents, so repeated runs skip parsing.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.mesh_cache')
+    with open(path, 'rb') as f:
+        digest = hashlib.file_digest(f, 'blake2b').hexdigest()[:32]
+    cache_path = os.path.join(cache_dir, f"{digest}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return cached['verts'], cached['faces']
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.obj':
+        verts, faces = load_obj(path)
+    elif ext == '.ply':
+        verts, faces = load_ply(path)
+    else:
+        raise ValueError(f"Unsupported mesh format: {path}")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write then rename, so a concurrent reader never sees a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, verts=verts, faces=faces)
+    os.replace(tmp_path, cache_path)
+    return verts, faces
+
+
+def load_obj(path):
+    """
+    Parses the 'v' and 'f' records of a Wavefront OBJ file. Lines are
+    classified on the raw byte buffer, the selected records are gathered
+    with one mask and converted by a single np.fromstring call each, so no
+    Python object is created per line. Comments ('#' to end of line) are
+    blanked first and records may be indented. Extra vertex components
+    (w, colors) and texture/normal indices are ignored; negative indices are
+    resolved against the vertices defined before the face.
+    """
+    buf = np.fromfile(path, dtype=np.uint8)
+    if len(buf) == 0 or buf[-1] != ord('\n'):
+        buf = np.append(buf, np.uint8(ord('\n')))
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # Blank every byte from the first '#' of a line up to its newline
+    hashes = np.flatnonzero(buf == ord('#'))
+    if len(hashes):
+        line = np.searchsorted(ends, hashes)
+        first = np.flatnonzero(np.diff(line, prepend=-1))
+        delta = np.zeros(len(buf) + 1, dtype=np.int8)
+        delta[hashes[first]] = 1
+        delta[ends[line[first]]] = -1
+        buf[np.cumsum(delta[:-1], dtype=np.int8) > 0] = ord(' ')
+
+    # Keyword position: first non-blank byte of each line (the newline if the line is blank)
+    keyword = starts.copy()
+    pending = np.flatnonzero(_is_blank(buf[keyword]))
+    while len(pending):
+        keyword[pending] += 1
+        pending = pending[_is_blank(buf[keyword[pending]])]
+    second = buf[np.minimum(keyword + 1, len(buf) - 1)]
+    record = (keyword < ends) & ((second == ord(' ')) | (second == ord('\t')))
+    is_vert = record & (buf[keyword] == ord('v'))
+    is_face = record & (buf[keyword] == ord('f'))
+    if not is_vert.any():
+        raise ValueError(f"No vertices in {path}")
+    # The keyword becomes a separator, so only numbers are left on the record lines
+    buf[keyword[is_vert | is_face]] = ord(' ')
+
+    text, counts = _gather_records(buf, starts, ends, is_vert)
+    values = np.fromstring(text, sep=' ')
+    if np.all(counts == counts[0]):
+        verts = values.reshape(-1, counts[0])[:, :3]
+    else:
+        offsets = np.cumsum(counts) - counts
+        verts = values[offsets[:, None] + np.arange(3)]
+    verts = np.ascontiguousarray(verts)
+
+    text, _ = _gather_records(buf, starts, ends, is_face)
+    # Keep only the position index of 'v/vt/vn' tokens
+    text = re.sub(rb'/[^\s]*', b'', text)
+    indices = np.fromstring(text, dtype=np.int64, sep=' ')
+    counts = _tokens_per_line(np.frombuffer(text, dtype=np.uint8))
+    verts_before = np.repeat(np.cumsum(is_vert)[is_face], counts)
+    indices = np.where(indices < 0, verts_before + indices, indices - 1)
+    return verts, _triangulate(indices, counts)
+
+
+def _is_blank(chars):
+    return (chars == ord(' ')) | (chars == ord('\t')) | (chars == ord('\r'))
+
+
+def _gather_records(buf, starts, ends, select):
+    """Concatenated text of the selected lines and their token counts."""
+    text = buf[np.repeat(select, ends - starts + 1)]
+    return text.tobytes(), _tokens_per_line(text)
+
+
+def _tokens_per_line(text):
+    """Whitespace-separated token count of every newline-terminated line in a byte array."""
+    space = (text == ord(' ')) | (text == ord('\t')) | (text == ord('\r')) | (text == ord('\n'))
+    token_start = ~space
+    token_start[1:] &= space[:-1]
+    ends = np.flatnonzero(text == ord('\n'))
+    per_line = np.add.reduceat(token_start, np.concatenate(([0], ends[:-1] + 1))) if len(ends) else []
+    return np.asarray(per_line, dtype=np.int64)
+
+
+def load_ply(path):
+    """
+    Reads a binary little- or big-endian PLY file. The vertex block is
+    memory-mapped and only x, y, z are copied out; faces are read as one
+    structured array when every polygon has the same vertex count.
+    """
+    with open(path, 'rb') as f:
+        header = []
+        while (line := f.readline()) and line.strip() != b'end_header':
+            header.append(line.decode('ascii').split())
+        offset = f.tell()
+
+    fmt = next(h[1] for h in header if h[0] == 'format')
+    if fmt == 'ascii':
+        raise ValueError(f"ASCII PLY is not supported: {path}")
+    order = '<' if fmt == 'binary_little_endian' else '>'
+
+    # [name, count, [(prop, type) | (prop, count_type, item_type)]]
+    elements = []
+    for h in header:
+        if h[0] == 'element':
+            elements.append([h[1], int(h[2]), []])
+        elif h[0] == 'property':
+            props = elements[-1][2]
+            if h[1] == 'list':
+                props.append((h[4], PLY_TYPES[h[2]], PLY_TYPES[h[3]]))
+            else:
+                props.append((h[2], PLY_TYPES[h[1]]))
+
+    verts = faces = None
+    for name, count, props in elements:
+        if any(len(p) == 3 for p in props):
+            if name != 'face' or len(props) != 1:
+                raise ValueError(f"Unsupported list property in element '{name}': {path}")
+            _, count_type, item_type = props[0]
+            faces, size = _read_ply_faces(path, offset, count, order + count_type, order + item_type)
+        else:
+            dtype = np.dtype([(p, order + t) for p, t in props])
+            size = dtype.itemsize * count
+            if name == 'vertex':
+                block = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+                verts = np.stack([block['x'], block['y'], block['z']], axis=1).astype(np.float64)
+                del block
+        offset += size
+
+    if verts is None or faces is None:
+        raise ValueError(f"PLY file needs vertex and face elements: {path}")
+    return verts, faces
+
+
+def _read_ply_faces(path, offset, count, count_type, item_type):
+    """Returns (triangles, byte size) of a PLY face block."""
+    count_type, item_type = np.dtype(count_type), np.dtype(item_type)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        first = int(np.frombuffer(f.read(count_type.itemsize), dtype=count_type)[0]) if count else 3
+    record = np.dtype([('n', count_type), ('idx', item_type, (first,))])
+    fits = offset + record.itemsize * count <= os.path.getsize(path)
+    block = np.memmap(path, dtype=record, mode='r', offset=offset, shape=(count,)) if fits and count else None
+    if block is not None and np.all(block['n'] == first):
+        counts = np.full(count, first, dtype=np.int64)
+        faces = _triangulate(np.asarray(block['idx'], dtype=np.int64).reshape(-1), counts)
+        return faces, record.itemsize * count
+
+    # Mixed polygon sizes: find the record offsets, then gather all indices at once
+    raw = np.memmap(path, dtype=np.uint8, mode='r', offset=offset)
+    offsets, counts = _list_record_offsets(raw, count, count_type, item_type)
+    starts = np.repeat(offsets + count_type.itemsize, counts)
+    starts += (np.arange(len(starts)) - np.repeat(np.cumsum(counts) - counts, counts)) * item_type.itemsize
+    items = np.ascontiguousarray(raw[starts[:, None] + np.arange(item_type.itemsize)]).view(item_type).ravel()
+    size = int(offsets[-1] + count_type.itemsize + counts[-1] * item_type.itemsize) if count else 0
+    return _triangulate(items.astype(np.int64), counts), size
+
+
+def _list_record_offsets(raw, count, count_type, item_type, chunk=1 << 16):
+    """
+    Byte offsets and item counts of `count` consecutive (n, item * n) records.
+    Each offset depends on every record before it, so rather than walking the
+    records one by one, every byte position of a chunk is treated as a
+    possible record start whose successor is p + size(p). The chain from the
+    chunk's first record is then followed by pointer doubling: log2 of the
+    records per chunk vectorized steps instead of one Python step per record.
+    """
+    c, s = count_type.itemsize, item_type.itemsize
+    found_offsets, found_counts = [], []
+    pos, found = 0, 0
+    while found < count:
+        window = raw[pos:pos + chunk + c - 1]
+        span = len(window) - c + 1
+        if span <= 0:
+            raise ValueError("PLY face block is truncated")
+        if c == 1:
+            n = window.astype(np.int64)
+        else:
+            n = np.ascontiguousarray(np.lib.stride_tricks.sliding_window_view(window, c)).view(count_type)
+            n = n.ravel().astype(np.int64)
+        successor = np.arange(span) + c + n * s
+        # Positions that could start a record; the real chain only visits these
+        candidates = np.flatnonzero((n >= 0) & (pos + successor <= len(raw)))
+        if len(candidates) == 0 or candidates[0] != 0:
+            raise ValueError("PLY face block is truncated")
+        # Successor as a candidate index; leaving the chunk ends the chain (sentinel)
+        sentinel = len(candidates)
+        index = np.full(span + 1, sentinel, dtype=np.int32)
+        index[candidates] = np.arange(sentinel, dtype=np.int32)
+        jump = np.append(index[np.minimum(successor[candidates], span)], np.int32(sentinel))
+
+        # After k steps chain holds the first 2^k records: chain[i + 2^k] = jump^(2^k)[chain[i]]
+        chain = np.zeros(1, dtype=np.int32)
+        while chain[-1] != sentinel and len(chain) < count - found:
+            chain = np.concatenate((chain, jump[chain]))
+            jump = jump[jump]
+        chain = chain[chain != sentinel][:count - found]
+
+        records = candidates[chain]
+        found_offsets.append(pos + records)
+        found_counts.append(n[records])
+        found += len(records)
+        pos += int(successor[records[-1]])
+    if not found_offsets:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(found_offsets), np.concatenate(found_counts)
+
+
+def _triangulate(indices, counts):
+    """Fan-triangulates polygons given as flat indices plus per-polygon counts."""
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.size and np.all(counts == 3):
+        return np.ascontiguousarray(indices.reshape(-1, 3))
+    starts = np.cumsum(counts) - counts
+    tris = np.maximum(counts - 2, 0)
+    poly = np.repeat(np.arange(len(counts)), tris)
+    # k-th triangle of a polygon is (v0, v[k+1], v[k+2])
+    k = np.arange(len(poly)) - np.repeat(np.cumsum(tris) - tris, tris)
+    base = starts[poly]
+    return np.stack((indices[base], indices[base + k + 1], indices[base + k + 2]), axis=1)
+
+
+def check_fixtures(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')):
+    """
+    Parses the fixture variants of one cube (comments, indentation, CRLF,
+    negative and v/vt/vn indices, mixed-size PLY faces) and checks that each
+    matches the plain cube.obj.
+    """
+    verts, faces = load_obj(os.path.join(directory, 'cube.obj'))
+    for name, load in (('cube_messy.obj', load_obj), ('cube_mixed.ply', load_ply)):
+        v, f = load(os.path.join(directory, name))
+        same = np.array_equal(v, verts) and np.array_equal(f, faces)
+        print(f"{name:>16}: {'ok' if same else 'MISMATCH'}")
+        if not same:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    check_fixtures()
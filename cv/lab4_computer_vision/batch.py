@@ -0,0 +1,137 @@
+import csv
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+from main import CVFieldLab
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.npy')
+MANIFEST_FIELDS = ['image', 'fields', 'read_s', 'compute_s', 'write_s', 'error']
+
+
+def iter_images(pattern):
+    """Знімки з каталогу (усі файли з IMAGE_EXTENSIONS) або за glob-шаблоном, у сталому порядку"""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*')
+    return [path for path in sorted(glob.glob(pattern))
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+class Manifest:
+    """Журнал по рядку на знімок; .jsonl пише JSON Lines, усе інше — CSV"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.jsonl = path.lower().endswith('.jsonl')
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, MANIFEST_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            self.writer.writerow(row)
+        # Рядок потрапляє на диск одразу: після збою журнал показує, що вже готово
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _stage(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_batch(pattern, output_root, manifest_path, depth=2, vectors=('geojson', 'bin'), **options):
+    """
+    Обробляє всі знімки за pattern трьома етапами, що працюють одночасно:
+    потік читання декодує наступний знімок, основний потік виконує
+    run_pipeline, а потік запису зберігає етапи через save_all у
+    output_root/<назва знімка>/ разом із полігонами ділянок у форматах vectors
+    і додає рядок у журнал. Черги між етапами вміщують depth знімків, тож
+    у пам'яті одночасно не більше кількох сцен.
+    Помилка одного знімка записується в журнал і не зупиняє пакет; збій
+    самого запису журналу зупиняє пакет і піднімається з run_batch.
+    options передаються в CVFieldLab (tile_size, workers тощо).
+    """
+    paths = iter_images(pattern)
+    print(f"--- Пакетна обробка: {len(paths)} знімків ---")
+    to_compute = queue.Queue(depth)
+    to_write = queue.Queue(depth)
+
+    def read():
+        for path in paths:
+            row = dict.fromkeys(MANIFEST_FIELDS, '')
+            row['image'] = path
+            start = time.perf_counter()
+            try:
+                lab = CVFieldLab(path, **options)
+            except Exception as e:
+                lab, row['error'] = None, str(e)
+            row['read_s'] = round(time.perf_counter() - start, 4)
+            to_compute.put((lab, row))
+        to_compute.put(None)
+
+    # Збій самого запису (журнал недоступний тощо) зупиняє пакет: потік запису
+    # зберігає помилку й далі спорожнює чергу, щоб основний потік не завис на put
+    write_errors = []
+    write_failed = threading.Event()
+
+    def write(manifest):
+        while (item := to_write.get()) is not None:
+            if write_failed.is_set():
+                continue
+            lab, row = item
+            try:
+                if lab is not None:
+                    stem = os.path.splitext(os.path.basename(row['image']))[0]
+                    start = time.perf_counter()
+                    try:
+                        lab.save_all(os.path.join(output_root, stem))
+                        if vectors:
+                            lab.save_vectors(os.path.join(output_root, stem), vectors)
+                    except Exception as e:
+                        row['error'] = str(e)
+                    row['write_s'] = round(time.perf_counter() - start, 4)
+                manifest.write(row)
+            except Exception as e:
+                write_errors.append(e)
+                write_failed.set()
+
+    manifest = Manifest(manifest_path)
+    start = time.perf_counter()
+    reader = _stage(read)
+    writer = _stage(write, manifest)
+    try:
+        while not write_failed.is_set() and (item := to_compute.get()) is not None:
+            lab, row = item
+            if lab is not None:
+                compute_start = time.perf_counter()
+                try:
+                    row['fields'] = lab.run_pipeline()
+                except Exception as e:
+                    lab, row['error'] = None, str(e)
+                row['compute_s'] = round(time.perf_counter() - compute_start, 4)
+            if row['error']:
+                print(f"Помилка ({row['image']}): {row['error']}")
+            to_write.put((lab, row))
+        if not write_failed.is_set():
+            reader.join()
+    finally:
+        # Потік читання — демон: при перериванні чи збої запису він не тримає процес
+        to_write.put(None)
+        writer.join()
+        manifest.close()
+    if write_errors:
+        raise write_errors[0]
+
+    elapsed = time.perf_counter() - start
+    print(f"\nОброблено {len(paths)} знімків за {elapsed:.1f} с ({len(paths) / max(elapsed, 1e-9):.2f} знімків/с). "
+          f"Журнал: {manifest_path}")
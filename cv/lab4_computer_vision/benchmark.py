@@ -0,0 +1,67 @@
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from main import CVFieldLab
+
+
+def synthetic_scene(height, width, fields, seed=0):
+    """Знімок-замінник: поле фону з випадковими багатокутниками-ділянками і шумом."""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), (60, 110, 80), dtype=np.uint8)
+    for _ in range(fields):
+        cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+        size, angle, corners = rng.uniform(40, 260), rng.uniform(0, np.pi), rng.integers(4, 7)
+        angles = angle + 2 * np.pi * np.arange(corners) / corners
+        radius = size * rng.uniform(0.7, 1.3, (corners, 1))
+        points = np.hstack([cx + radius * np.cos(angles)[:, None], cy + radius * np.sin(angles)[:, None]])
+        cv2.fillPoly(image, [points.astype(np.int32)], tuple(int(c) for c in rng.integers(20, 230, 3)))
+    return cv2.add(image, rng.integers(0, 25, image.shape, dtype=np.uint8))
+
+
+def bench_workers(path, tile_size, max_workers, executors):
+    """
+    Тайлів за секунду залежно від кількості ядер. Ефективність — прискорення,
+    поділене на кількість воркерів (1.0 — ідеальне масштабування). Поля мають
+    збігатися з послідовним запуском при будь-якій кількості воркерів.
+    """
+    key = lambda fields: sorted(field.reshape(-1).tolist() for field in fields)
+    serial = CVFieldLab(path, tile_size=tile_size, preview_size=1024)
+    serial.run_pipeline()
+    reference, base = key(serial.fields), serial.stats['tiles_per_sec']
+
+    print(f"Тайли {tile_size}px, {serial.stats['tiles']} тайлів, {os.cpu_count()} CPU")
+    print(f"{'пул':>8} {'воркери':>8} {'тайлів/с':>9} {'приск.':>7} {'ефект.':>7} {'збіг':>5}")
+    print(f"{'-':>8} {1:>8} {base:>9.1f} {1.0:>6.2f}x {1.0:>7.2f} {'-':>5}")
+    for executor in executors:
+        workers = 2
+        while workers <= max_workers:
+            lab = CVFieldLab(path, tile_size=tile_size, preview_size=1024, workers=workers, executor=executor)
+            lab.run_pipeline()
+            speedup = lab.stats['tiles_per_sec'] / base
+            same = key(lab.fields) == reference
+            print(f"{executor:>8} {workers:>8} {lab.stats['tiles_per_sec']:>9.1f} {speedup:>6.2f}x "
+                  f"{speedup / workers:>7.2f} {str(same):>5}")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк паралельної обробки тайлів lab4")
+    parser.add_argument("image", nargs="?", help="сцена; без неї генерується синтетична у .npy")
+    parser.add_argument("--size", type=int, nargs=2, default=[8192, 8192], metavar=("H", "W"))
+    parser.add_argument("--tile-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="найбільший пул")
+    parser.add_argument("--executors", nargs="+", choices=("thread", "process"), default=["thread", "process"])
+    args = parser.parse_args()
+
+    if args.image:
+        bench_workers(args.image, args.tile_size, args.workers, args.executors)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'scene.npy')
+            height, width = args.size
+            np.save(path, synthetic_scene(height, width, height * width // 100000))
+            bench_workers(path, args.tile_size, args.workers, args.executors)
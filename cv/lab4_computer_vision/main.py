@@ -1,63 +1,220 @@
+import argparse
+import time
+from collections.abc import Mapping
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 
+from tiling import (CANNY_HIGH, CANNY_LOW, ContourStitcher, TileProcessor, iter_tiles, map_tiles, open_raster,
+                    preview_box, preview_cells)
+from vectors import describe_fields, write_binary, write_geojson
+
 # Створення директорії для результатів
 output_dir = 'lab4_results'
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
+# Геометричний фільтр за площею (пікселі)
+FIELD_MIN_AREA = 1500
+
+STAGES = ('01_original', '02_enhanced_hist', '03_filtered', '04_vectorized_edges', '05_identified_objects')
+# Які етапи лишаються в results (а отже, потрапляють у PNG і звіт)
+RETAIN_POLICIES = {
+    'none': (),
+    'final': ('05_identified_objects',),
+    'all': STAGES,
+}
+
+class LazyStages(Mapping):
+    """
+    Етапи конвеєра, що рахуються при першому зверненні. Як словник видно лише
+    етапи з retained — вони й кешуються; решта доступні через compute (наприклад,
+    ребра для пошуку контурів), але в пам'яті не лишаються.
+    """
+
+    def __init__(self, producers, retained):
+        self.producers = producers
+        self.retained = [name for name in STAGES if name in retained and name in producers]
+        self.cache = {}
+
+    def compute(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        value = self.producers[name]()
+        if name in self.retained:
+            self.cache[name] = value
+        return value
+
+    def __getitem__(self, name):
+        if name not in self.retained:
+            raise KeyError(name)
+        return self.compute(name)
+
+    def __iter__(self):
+        return iter(self.retained)
+
+    def __len__(self):
+        return len(self.retained)
+
 class CVFieldLab:
-    def __init__(self, image_path):
-        self.image = cv2.imread(image_path)
-        if self.image is None:
-            raise FileNotFoundError(f"Неможливо завантажити {image_path}")
+    def __init__(self, image_path, tile_size=None, halo=128, clahe_cell=128, preview_size=2048,
+                 workers=1, executor='thread', retain='all', geotransform=None, crs=None):
+        """
+        tile_size вмикає обробку тайлами для сцен, що не вміщаються в пам'ять:
+        растр читається вікнами tile_size + ореол halo, а CLAHE рахується
+        комірками clahe_cell пікселів (tile_size і halo мають бути кратні їй).
+        workers > 1 обробляє тайли паралельно в пулі executor ('thread' або 'process').
+        retain — які етапи тримати в results: 'none', 'final' або 'all'.
+        geotransform (порядок GDAL) і crs прив'язують полігони ділянок до карти;
+        для GeoTIFF вони за замовчуванням беруться з файлу (потрібен rasterio).
+        """
+        if retain not in RETAIN_POLICIES:
+            raise ValueError(f"retain має бути одним із {', '.join(RETAIN_POLICIES)}")
+        self.retain = RETAIN_POLICIES[retain]
+        self.image_path = image_path
+        self.workers = workers
+        self.executor = executor
+        self.tile_size = tile_size
+        self.halo = halo
+        self.clahe_cell = clahe_cell
+        self.preview_size = preview_size
+        if tile_size is not None and (tile_size % clahe_cell or halo % clahe_cell or halo < clahe_cell):
+            raise ValueError("tile_size і halo мають бути кратні clahe_cell, а halo — не менше однієї комірки")
+        # Обидва режими відкривають растр однаково, тож геоприв'язка GeoTIFF читається завжди
+        self.source = open_raster(image_path)
+        if tile_size is None:
+            self.image = self.source.read(0, self.source.shape[0], 0, self.source.shape[1])
+            if self.image.ndim == 2:
+                self.image = cv2.cvtColor(self.image, cv2.COLOR_GRAY2BGR)
+        self.geotransform = geotransform or getattr(self.source, 'geotransform', None)
+        self.crs = crs or getattr(self.source, 'crs', None)
         self.results = {}
+        self.fields = []
+        # Ділянки з площею й периметром (vectors.Field) — те саме, що fields, але для експорту
+        self.polygons = []
+        self.stats = {}
 
     def run_pipeline(self):
+        if self.tile_size is not None:
+            return self.run_tiled()
+
+        self.results = LazyStages({
+            '01_original': self._original,
+            '02_enhanced_hist': self._enhanced,
+            '03_filtered': self._filtered,
+            '04_vectorized_edges': self._edges,
+            '05_identified_objects': self._identified,
+        }, self.retain)
+
+        # 5. Ідентифікація: Контури та Геометрія
+        edges = self.results.compute('04_vectorized_edges')
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self.fields = self.select_fields(contours)
+        self.polygons = describe_fields(self.fields, self.geotransform)
+        return len(self.fields)
+
+    def _original(self):
         # 1. Оригінал (Корекція кольору для відображення)
-        rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-        self.results['01_original'] = rgb
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
 
+    def _enhanced(self):
         # 2. Покращення: Грейскейл + CLAHE (Локальна еквалізація)
         gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
-        self.results['02_enhanced_hist'] = enhanced
+        return clahe.apply(gray)
 
+    def _filtered(self):
         # 3. Фільтрація: Gaussian Blur (Метод усунення шуму)
-        blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
-        self.results['03_filtered'] = blurred
+        return cv2.GaussianBlur(self.results.compute('02_enhanced_hist'), (5, 5), 0)
 
+    def _edges(self):
         # 4. Векторизація: Canny Edge Detection
-        edges = cv2.Canny(blurred, 30, 120)
-        self.results['04_vectorized_edges'] = edges
+        return cv2.Canny(self.results.compute('03_filtered'), CANNY_LOW, CANNY_HIGH)
 
-        # 5. Ідентифікація: Контури та Геометрія
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        identified = rgb.copy()
+    def _identified(self):
+        identified = self.results.compute('01_original').copy()
+        cv2.drawContours(identified, self.fields, -1, (0, 255, 0), 3)
+        return identified
 
-        count = 0
+    def select_fields(self, contours):
+        """Апроксимовані багатокутники контурів, схожих на посівні площі"""
+        fields = []
         for cnt in contours:
             area = cv2.contourArea(cnt)
-            if area > 1500: # Геометричний фільтр за площею
+            if area > FIELD_MIN_AREA: # Геометричний фільтр за площею
                 epsilon = 0.03 * cv2.arcLength(cnt, True)
                 approx = cv2.approxPolyDP(cnt, epsilon, True)
 
                 # Посівні площі (4-6 кутів)
                 if 4 <= len(approx) <= 8:
-                    cv2.drawContours(identified, [approx], -1, (0, 255, 0), 3)
-                    count += 1
+                    fields.append(approx)
+        return fields
+
+    def run_tiled(self):
+        """
+        Той самий конвеєр тайлами з ореолом: CLAHE, розмиття і Canny рахуються
+        у вікні тайла, а в результат іде лише його ядро, тож шви не видно.
+        Гістерезис Canny для ребер, що перетинають шви, і їхні контури зводить
+        ContourStitcher — ребра й ділянки збігаються з обробкою всієї сцени. Повнорозмірні етапи
+        не зберігаються: у self.results лише прев'ю (довша сторона — preview_size),
+        тож пікова пам'ять залежить від розміру тайла, а не сцени.
+        """
+        height, width = self.source.shape
+        scale = min(1.0, self.preview_size / max(height, width))
+        preview_shape = (max(1, round(height * scale)), max(1, round(width * scale)))
+        # Прев'ю будуються лише для збережених етапів; оригінал потрібен і для 05
+        needed = [name for name in STAGES[:4]
+                  if name in self.retain or (name == '01_original' and '05_identified_objects' in self.retain)]
+        previews = {name: np.zeros(preview_shape + ((3,) if name == '01_original' else ()), dtype=np.uint8)
+                    for name in needed}
+        stitcher = ContourStitcher(self.source.shape, self.tile_size)
+        processor = TileProcessor(self.image_path, self.source, self.tile_size, self.clahe_cell, scale,
+                                  stages=[STAGES.index(name) for name in needed])
+
+        # Тайли аналізуються паралельно, а зводяться тут у порядку рядків —
+        # результат не залежить від кількості потоків
+        start = time.perf_counter()
+        tiles = iter_tiles(self.source.shape, self.tile_size, self.halo)
+        for tile, contours, stages in map_tiles(processor, tiles, self.workers, self.executor):
+            stitcher.merge(tile, contours)
+            y0, y1, x0, x1 = preview_box(tile, scale)
+            for name, stage in zip(previews, stages):
+                previews[name][y0:y1, x0:x1] = stage
+        elapsed = time.perf_counter() - start
+        count = stitcher.rows * stitcher.cols
+        self.stats = {'tiles': count, 'seconds': elapsed, 'tiles_per_sec': count / elapsed}
+        edges_preview = previews.get('04_vectorized_edges')
 
-        self.results['05_identified_objects'] = identified
-        return count
+        def paint(y0, x0, mask):
+            # Ребра, що перетинають шви, відомі лише після гістерезису по всій сцені
+            ys, xs = np.nonzero(mask)
+            cy, cx = preview_cells(ys + y0, xs + x0, self.source.shape, self.tile_size, scale)
+            edges_preview[cy, cx] = 255
 
-    def save_all(self):
-        """Збереження кожного кроку конвеєру як окремий файл"""
-        print(f"--- Збереження результатів у папку {output_dir} ---")
+        contours = stitcher.finish(FIELD_MIN_AREA, paint if edges_preview is not None else None)
+        self.fields = self.select_fields(contours)
+        self.polygons = describe_fields(self.fields, self.geotransform)
+
+        def identified():
+            image = previews['01_original'].copy()
+            scaled = [np.round(field * scale).astype(np.int32) for field in self.fields]
+            cv2.drawContours(image, scaled, -1, (0, 255, 0), max(1, round(3 * scale)))
+            return image
+
+        producers = {name: (lambda name=name: previews[name]) for name in previews}
+        producers['05_identified_objects'] = identified
+        self.results = LazyStages(producers, self.retain)
+        return len(self.fields)
+
+    def save_all(self, directory=output_dir):
+        """Збереження кожного збереженого (retain) кроку конвеєру як окремий файл"""
+        if not self.results:
+            return
+        os.makedirs(directory, exist_ok=True)
+        print(f"--- Збереження результатів у папку {directory} ---")
         for name, img in self.results.items():
-            file_path = os.path.join(output_dir, f"{name}.png")
+            file_path = os.path.join(directory, f"{name}.png")
             # OpenCV використовує BGR, тому для кольорових фото робимо реверс перед записом
             if len(img.shape) == 3:
                 save_img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
@@ -66,11 +223,26 @@ class CVFieldLab:
             cv2.imwrite(file_path, save_img)
             print(f"Збережено: {file_path}")
 
+    def save_vectors(self, directory=output_dir, formats=('geojson', 'bin')):
+        """
+        Полігони ділянок для подальших систем: fields.geojson (координати карти,
+        якщо є геоприв'язка) і/або компактний fields.fldv (див. vectors.read_binary)
+        """
+        os.makedirs(directory, exist_ok=True)
+        if 'geojson' in formats:
+            write_geojson(os.path.join(directory, 'fields.geojson'), self.polygons, self.geotransform, self.crs)
+        if 'bin' in formats:
+            write_binary(os.path.join(directory, 'fields.fldv'), self.polygons, self.geotransform)
+        print(f"Полігони ділянок ({len(self.polygons)}) збережено у {directory}")
+
     def generate_report_plot(self):
         """Фінальний колаж для звіту"""
-        plt.figure(figsize=(20, 10))
+        if not self.results:
+            print("Звіт пропущено: жоден етап не збережено (retain='none')")
+            return
+        plt.figure(figsize=(4 * len(self.results), 10))
         for i, (name, img) in enumerate(self.results.items()):
-            plt.subplot(1, 5, i+1)
+            plt.subplot(1, len(self.results), i+1)
             plt.imshow(img, cmap='gray' if len(img.shape) == 2 else None)
             plt.title(name.replace('_', ' ').capitalize())
             plt.axis('off')
@@ -80,15 +252,56 @@ class CVFieldLab:
         plt.show()
 
 # --- Запуск ---
-def main():
+def main(image_path='input_dzz.png', tile_size=None, halo=128, clahe_cell=128, workers=1, executor='thread',
+         retain='all', report=True, vectors=('geojson', 'bin'), geotransform=None):
     try:
-        lab = CVFieldLab('input_dzz.png')
+        lab = CVFieldLab(image_path, tile_size=tile_size, halo=halo, clahe_cell=clahe_cell,
+                         workers=workers, executor=executor, retain=retain, geotransform=geotransform)
         found = lab.run_pipeline()
+        if lab.stats:
+            print(f"Оброблено {lab.stats['tiles']} тайлів за {lab.stats['seconds']:.1f} с "
+                  f"({lab.stats['tiles_per_sec']:.1f} тайлів/с, потоків: {workers})")
         lab.save_all()
-        lab.generate_report_plot()
+        if vectors:
+            lab.save_vectors(formats=vectors)
+        if report:
+            lab.generate_report_plot()
         print(f"\nУспішно ідентифіковано {found} посівних площ.")
     except Exception as e:
         print(f"Помилка: {e}")
 
+def is_batch(image):
+    """Каталог або glob-шаблон означає пакетний режим"""
+    return os.path.isdir(image) or any(char in image for char in '*?[')
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Лабораторна 4: виділення посівних площ на знімку ДЗЗ")
+    parser.add_argument("image", nargs="?", default='input_dzz.png',
+                        help="знімок (.png/.jpg, .npy як memmap або GeoTIFF через rasterio), "
+                             "каталог або glob-шаблон для пакетної обробки")
+    parser.add_argument("--tile-size", type=int, help="обробка тайлами такого розміру (для великих сцен)")
+    parser.add_argument("--halo", type=int, default=128, help="ореол тайла в пікселях")
+    parser.add_argument("--clahe-cell", type=int, default=128, help="розмір комірки CLAHE у тайловому режимі")
+    parser.add_argument("--workers", type=int, default=1, help="паралельна обробка тайлів (наприклад, os.cpu_count())")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread",
+                        help="пул для тайлів: потоки (OpenCV відпускає GIL) або процеси")
+    parser.add_argument("--retain", choices=tuple(RETAIN_POLICIES), default="all",
+                        help="які етапи зберігати в PNG: жодного, лише фінальний або всі")
+    parser.add_argument("--no-report", action="store_true", help="не будувати колаж для звіту")
+    parser.add_argument("--vectors", nargs="*", choices=("geojson", "bin"), default=["geojson", "bin"],
+                        help="формати полігонів ділянок; без значень — не зберігати")
+    parser.add_argument("--geotransform", type=float, nargs=6, metavar="G",
+                        help="прив'язка пікселів до карти (x0 dx rx y0 ry dy, як у GDAL); для GeoTIFF — з файлу")
+    parser.add_argument("--manifest", default=os.path.join(output_dir, 'manifest.csv'),
+                        help="журнал пакетного режиму: .csv або .jsonl")
+    args = parser.parse_args()
+
+    if is_batch(args.image):
+        from batch import run_batch
+        run_batch(args.image, output_dir, args.manifest, tile_size=args.tile_size, halo=args.halo,
+                  clahe_cell=args.clahe_cell, workers=args.workers, executor=args.executor, retain=args.retain,
+                  vectors=args.vectors, geotransform=args.geotransform)
+    else:
+        main(args.image, tile_size=args.tile_size, halo=args.halo, clahe_cell=args.clahe_cell,
+             workers=args.workers, executor=args.executor, retain=args.retain, report=not args.no_report,
+             vectors=args.vectors, geotransform=args.geotransform)
\ No newline at end of file
@@ -0,0 +1,437 @@
+import os
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Тайл: індекси в сітці, ядро (те, що він віддає в результат) і вікно з ореолом (те, що читається)
+Tile = namedtuple('Tile', 'row col y0 y1 x0 x1 wy0 wy1 wx0 wx1')
+
+
+class ArraySource:
+    """Растр, що вже є масивом (H, W[, 3]) BGR — memmap .npy або зображення з cv2.imread."""
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape[:2]
+
+    def read(self, y0, y1, x0, x1):
+        return np.ascontiguousarray(self.array[y0:y1, x0:x1])
+
+
+class RasterioSource:
+    """
+    GeoTIFF через rasterio: кожне вікно читається з диска окремо. Датасет
+    GDAL не можна ділити між потоками, тож кожен потік відкриває власний.
+    """
+
+    def __init__(self, path):
+        import rasterio
+        from rasterio.windows import Window
+        self._open = rasterio.open
+        self._window = Window
+        self.path = path
+        self._local = threading.local()
+        self.shape = (self.dataset.height, self.dataset.width)
+        # Геоприв'язка для векторного експорту: геотрансформ у порядку GDAL і система координат.
+        # Файл без прив'язки rasterio віддає з одиничним трансформом — це не координати карти
+        dataset = self.dataset
+        georeferenced = dataset.crs is not None or not dataset.transform.is_identity
+        self.geotransform = dataset.transform.to_gdal() if georeferenced else None
+        self.crs = dataset.crs.to_string() if dataset.crs else None
+
+    @property
+    def dataset(self):
+        if not hasattr(self._local, 'dataset'):
+            self._local.dataset = self._open(self.path)
+        return self._local.dataset
+
+    def read(self, y0, y1, x0, x1):
+        dataset = self.dataset
+        bands = min(dataset.count, 3)
+        data = dataset.read(list(range(1, bands + 1)), window=self._window(x0, y0, x1 - x0, y1 - y0))
+        data = np.moveaxis(data, 0, -1)
+        # rasterio віддає RGB, конвеєр очікує BGR як cv2.imread
+        return np.ascontiguousarray(data[..., ::-1] if bands == 3 else data[..., 0])
+
+
+def open_raster(path):
+    """
+    Джерело для читання вікнами. .npy відкривається як memmap, .tif/.tiff — через
+    rasterio, якщо він встановлений; в обох випадках у пам'яті лише поточне вікно.
+    Інші формати cv2.imread читає цілком, але проміжні результати однаково
+    обмежені розміром тайла. Геоприв'язку (geotransform, crs) має лише джерело
+    rasterio; без нього GeoTIFF читається як звичайне зображення.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return ArraySource(np.load(path, mmap_mode='r'))
+    if ext in ('.tif', '.tiff'):
+        try:
+            return RasterioSource(path)
+        except ImportError:
+            print(f"Увага: rasterio не встановлено — {path} читається без геоприв'язки, "
+                  f"полігони ділянок будуть у пікселях")
+    image = cv2.imread(path)
+    if image is None:
+        raise FileNotFoundError(f"Неможливо завантажити {path}")
+    return ArraySource(image)
+
+
+def iter_tiles(shape, tile_size, halo):
+    """Тайли сцени в порядку рядків; вікно — ядро з ореолом halo, обрізане краями сцени."""
+    height, width = shape
+    for row, y0 in enumerate(range(0, height, tile_size)):
+        for col, x0 in enumerate(range(0, width, tile_size)):
+            y1, x1 = min(y0 + tile_size, height), min(x0 + tile_size, width)
+            yield Tile(row, col, y0, y1, x0, x1,
+                       max(y0 - halo, 0), min(y1 + halo, height), max(x0 - halo, 0), min(x1 + halo, width))
+
+
+def clahe_cells(gray, clip_limit=2.0, cell=128):
+    """
+    CLAHE з фіксованою коміркою cell x cell пікселів. Зображення доповнюється
+    знизу й праворуч (BORDER_REFLECT_101) до кратного cell, тож сітка комірок
+    прив'язана до початку координат: вікно, що починається на межі комірки і має
+    ореол хоча б в одну комірку, дає в ядрі ті самі значення, що й уся сцена.
+    """
+    height, width = gray.shape
+    pad_y, pad_x = -height % cell, -width % cell
+    if pad_y or pad_x:
+        gray = cv2.copyMakeBorder(gray, 0, pad_y, 0, pad_x, cv2.BORDER_REFLECT_101)
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(gray.shape[1] // cell, gray.shape[0] // cell))
+    return clahe.apply(gray)[:height, :width]
+
+
+# Пороги Canny: пікселі з градієнтом понад CANNY_HIGH — сильні ребра, понад CANNY_LOW — слабкі
+CANNY_LOW, CANNY_HIGH = 30, 120
+
+
+def process_window(bgr, clahe_cell=128):
+    """
+    Етапи 2-4 конвеєра для одного вікна: (enhanced, blurred, weak, strong).
+    Гістерезис Canny не локальний — ланцюжок слабких пікселів, що тягнеться
+    від сильного, може вийти за будь-який ореол. Тому вікно дає дві маски
+    після придушення немаксимумів: weak = Canny(blurred, LOW, LOW) — усі
+    кандидати, і strong = Canny(blurred, HIGH, HIGH) — сильні серед них.
+    Canny(blurred, LOW, HIGH) — це рівно ті 8-зв'язні компоненти weak, що
+    містять піксель strong; ContourStitcher зводить їх через шви.
+    """
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) if bgr.ndim == 3 else bgr
+    enhanced = clahe_cells(gray, 2.0, clahe_cell)
+    blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
+    weak = cv2.Canny(blurred, CANNY_LOW, CANNY_LOW)
+    strong = cv2.Canny(blurred, CANNY_HIGH, CANNY_HIGH)
+    return enhanced, blurred, weak, strong
+
+
+# Результат аналізу ребер одного тайла: замкнені контури (у координатах сцени),
+# відкриті фрагменти {мітка: (y0, x0, h, w, упаковані біти, чи є сильний піксель)},
+# мітки на чотирьох краях ядра і кількість міток разом із фоном
+TileContours = namedtuple('TileContours', 'closed fragments top bottom left right count')
+
+
+def analyze_tile(tile, weak, strong, rows, cols):
+    """
+    Незалежна від сусідів частина гістерезису й склеювання контурів для одного
+    тайла (її можна рахувати паралельно). weak і strong — маски ядра тайла з
+    process_window (uint8, 0/255), rows і cols — розмір сітки тайлів.
+    Компоненти weak, що не торкаються внутрішніх швів, вирішуються на місці:
+    з сильним пікселем це ребро і одразу контур, без нього — ні. Решта
+    пакуються у бітові фрагменти з позначкою, чи є в них сильний піксель.
+    Повертає (TileContours, маска ребер, уже остаточних у цьому тайлі).
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(weak, connectivity=8)
+    has_strong = np.zeros(count, dtype=bool)
+    has_strong[labels[strong > 0]] = True
+
+    # Мітки, що торкаються шву з сусіднім тайлом, — відкриті фрагменти
+    sides = []
+    if tile.row > 0:
+        sides.append(labels[0])
+    if tile.row < rows - 1:
+        sides.append(labels[-1])
+    if tile.col > 0:
+        sides.append(labels[:, 0])
+    if tile.col < cols - 1:
+        sides.append(labels[:, -1])
+    open_labels = np.unique(np.concatenate(sides)) if sides else np.zeros(0, dtype=np.int32)
+    open_labels = open_labels[open_labels > 0]
+
+    final = has_strong.copy()
+    final[0] = False
+    final[open_labels] = False
+    edges = np.where(final[labels], np.uint8(255), np.uint8(0))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    offset = np.array([tile.x0, tile.y0], dtype=np.int32)
+    closed = [contour + offset for contour in contours]
+
+    fragments = {}
+    for label in open_labels.tolist():
+        x, y, w, h, _ = stats[label]
+        mask = labels[y:y + h, x:x + w] == label
+        fragments[label] = (tile.y0 + y, tile.x0 + x, h, w, np.packbits(mask), bool(has_strong[label]))
+
+    result = TileContours(closed, fragments, labels[0].copy(), labels[-1].copy(),
+                          labels[:, 0].copy(), labels[:, -1].copy(), count)
+    return result, edges
+
+
+def preview_box(tile, scale):
+    """Місце ядра тайла на прев'ю зі сторонами, зменшеними в scale разів: (y0, y1, x0, x1)."""
+    return round(tile.y0 * scale), round(tile.y1 * scale), round(tile.x0 * scale), round(tile.x1 * scale)
+
+
+def preview_cells(ys, xs, shape, tile_size, scale):
+    """
+    Клітинки прев'ю для пікселів сцени (ys, xs): кожен піксель потрапляє в
+    preview_box свого тайла, тож ребра, намальовані з тайла чи зі склеєного
+    фрагмента, лягають в ті самі клітинки. Для тонких ребер це max-пулінг:
+    клітинка світла, якщо в ній є хоч один піксель ребра.
+    """
+    cells = []
+    for coords, size in ((ys, shape[0]), (xs, shape[1])):
+        start = coords // tile_size * tile_size
+        end = np.minimum(start + tile_size, size)
+        box0, box1 = np.round(start * scale).astype(np.int64), np.round(end * scale).astype(np.int64)
+        cells.append(box0 + (coords - start) * (box1 - box0) // (end - start))
+    return cells
+
+
+class TileProcessor:
+    """
+    Уся незалежна робота над тайлом: читання вікна, етапи 2-4, analyze_tile і
+    зменшення ядра для прев'ю. Виклик повертає (tile, TileContours, прев'ю).
+    stages — номери етапів для прев'ю (0 — RGB, 1 — CLAHE, 2 — розмиття,
+    3 — ребра); прев'ю повертаються в тому ж порядку. На прев'ю ребер лише
+    остаточні в тайлі ребра — фрагменти, що перетинають шви, домальовуються
+    після гістерезису по всій сцені. Об'єкт передається в процеси без
+    джерела — кожен процес відкриває растр за шляхом сам.
+    """
+
+    def __init__(self, path, source, tile_size, clahe_cell=128, scale=1.0, stages=(0, 1, 2, 3)):
+        self.path = path
+        self.source = source
+        self.shape = source.shape
+        self.tile_size = tile_size
+        self.rows, self.cols = -(-self.shape[0] // tile_size), -(-self.shape[1] // tile_size)
+        self.clahe_cell = clahe_cell
+        self.scale = scale
+        self.stages = tuple(stages)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['source'] = None
+        return state
+
+    def __call__(self, tile):
+        if self.source is None:
+            self.source = open_raster(self.path)
+        window = self.source.read(tile.wy0, tile.wy1, tile.wx0, tile.wx1)
+        enhanced, blurred, weak, strong = process_window(window, self.clahe_cell)
+        core = (slice(tile.y0 - tile.wy0, tile.y1 - tile.wy0), slice(tile.x0 - tile.wx0, tile.x1 - tile.wx0))
+        contours, edges = analyze_tile(tile, np.ascontiguousarray(weak[core]), np.ascontiguousarray(strong[core]),
+                                       self.rows, self.cols)
+
+        y0, y1, x0, x1 = preview_box(tile, self.scale)
+        previews = []
+        if self.stages and y1 > y0 and x1 > x0:
+            for index in self.stages:
+                if index == 0:
+                    rgb = cv2.cvtColor(window[core], cv2.COLOR_BGR2RGB if window.ndim == 3 else cv2.COLOR_GRAY2RGB)
+                    previews.append(cv2.resize(rgb, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA))
+                elif index == 3:
+                    ys, xs = np.nonzero(edges)
+                    cy, cx = preview_cells(ys + tile.y0, xs + tile.x0, self.shape, self.tile_size, self.scale)
+                    patch = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+                    patch[cy - y0, cx - x0] = 255
+                    previews.append(patch)
+                else:
+                    stage = (enhanced, blurred)[index - 1]
+                    previews.append(cv2.resize(stage[core], (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA))
+        return tile, contours, previews
+
+
+_worker_processor = None
+
+def _init_worker(processor):
+    global _worker_processor
+    cv2.setNumThreads(1)
+    _worker_processor = processor
+
+def _process_in_worker(tile):
+    return _worker_processor(tile)
+
+
+def map_tiles(processor, tiles, workers=1, executor='thread'):
+    """
+    Результати processor(tile) у порядку tiles. При workers > 1 тайли
+    розподіляються по пулу: 'thread' — потоки (OpenCV відпускає GIL на час
+    своїх функцій, тож потоки справді працюють паралельно і ділять одне
+    джерело), 'process' — процеси, якщо в профілі переважає Python-код.
+    Одночасно в роботі не більше 2 * workers тайлів, тож пам'ять обмежена.
+    Власні потоки OpenCV на цей час вимикаються, щоб не змагатися з пулом.
+    """
+    if workers <= 1:
+        for tile in tiles:
+            yield processor(tile)
+        return
+
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(workers)
+        submit = lambda tile: pool.submit(processor, tile)
+    elif executor == 'process':
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(processor,))
+        submit = lambda tile: pool.submit(_process_in_worker, tile)
+    else:
+        raise ValueError(f"Невідомий executor: {executor}")
+
+    threads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    pending = deque()
+    try:
+        with pool:
+            try:
+                for tile in tiles:
+                    pending.append(submit(tile))
+                    if len(pending) >= 2 * workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Зупинка посередині: тайли, які ніхто не забере, скасовуються
+                for future in pending:
+                    future.cancel()
+    finally:
+        cv2.setNumThreads(threads)
+
+
+class ContourStitcher:
+    """
+    Гістерезис Canny і зовнішні контури (як cv2.findContours з RETR_EXTERNAL)
+    для сцени, обробленої тайлами. Компоненти слабких ребер, що не торкаються
+    внутрішніх швів, вирішуються прямо в тайлі. Решта зберігаються як упаковані
+    бітові фрагменти; фрагменти, з'єднані через шов (8-зв'язність, зокрема по
+    діагоналі на кутах), об'єднуються, і група стає ребром, якщо хоч один її
+    фрагмент має сильний піксель — рівно як гістерезис на всій сцені. Групи-ребра
+    трасуються на полотні розміром з їхню спільну рамку. Тож пам'ять обмежена
+    тайлом і найбільшим об'єктом, що перетинає шов, а не сценою.
+    Тайли зводяться через merge у порядку рядків — результат не залежить від
+    того, в якому порядку чи де їх аналізували.
+    """
+
+    def __init__(self, shape, tile_size):
+        self.rows = -(-shape[0] // tile_size)
+        self.cols = -(-shape[1] // tile_size)
+        self.contours = []
+        # id фрагмента -> (y0, x0, h, w, упаковані біти, чи є сильний піксель); id — глобальний номер мітки
+        self.fragments = {}
+        self.parent = {}
+        self.next_id = 1
+        # Нижні рядки id тайлів попереднього і поточного ряду та правий стовпець лівого сусіда
+        self.bottom = {}
+        self.right = None
+
+    def add_tile(self, tile, weak, strong):
+        """weak і strong — маски ядра тайла з process_window (uint8, 0/255)."""
+        self.merge(tile, analyze_tile(tile, weak, strong, self.rows, self.cols)[0])
+
+    def merge(self, tile, result):
+        """Зводить результат analyze_tile; тайли мають надходити в порядку рядків."""
+        base = self.next_id - 1
+        self.next_id += result.count - 1
+        self.contours.extend(result.closed)
+        for label, fragment in result.fragments.items():
+            self.fragments[label + base] = fragment
+            self.parent[label + base] = label + base
+
+        def ids(labels):
+            return np.where(labels > 0, labels + base, 0)
+
+        top, bottom, left, right = ids(result.top), ids(result.bottom), ids(result.left), ids(result.right)
+
+        # Шви з верхнім і лівим сусідами та діагональні кути
+        if tile.row > 0:
+            self._join(top, self.bottom[tile.row - 1, tile.col])
+            if tile.col > 0:
+                self._join(top[:1], self.bottom[tile.row - 1, tile.col - 1][-1:], shifts=(0,))
+            if tile.col < self.cols - 1:
+                self._join(top[-1:], self.bottom[tile.row - 1, tile.col + 1][:1], shifts=(0,))
+            if tile.col > 0:
+                del self.bottom[tile.row - 1, tile.col - 1]
+            if tile.col == self.cols - 1:
+                del self.bottom[tile.row - 1, tile.col]
+        if tile.col > 0:
+            self._join(left, self.right)
+        self.bottom[tile.row, tile.col] = bottom
+        self.right = right
+
+    def _join(self, side, neighbor, shifts=(-1, 0, 1)):
+        """Об'єднує фрагменти, чиї пікселі на двох боках шву є 8-сусідами."""
+        pairs = []
+        for shift in shifts:
+            a = side[max(shift, 0):len(side) + min(shift, 0)]
+            b = neighbor[max(-shift, 0):len(neighbor) + min(-shift, 0)]
+            touching = (a > 0) & (b > 0)
+            pairs.append(np.stack([a[touching], b[touching]], axis=1))
+        for a, b in np.unique(np.concatenate(pairs), axis=0).tolist():
+            root_a, root_b = self._find(a), self._find(b)
+            if root_a != root_b:
+                self.parent[root_b] = root_a
+
+    def _find(self, node):
+        while self.parent[node] != node:
+            self.parent[node] = self.parent[self.parent[node]]
+            node = self.parent[node]
+        return node
+
+    def finish(self, min_area=0, paint=None):
+        """
+        Зовнішні контури сцени з площею понад min_area. Контур, що лежить
+        усередині іншої склеєної компоненти, не зовнішній для сцени (хоч і був
+        зовнішнім у своєму тайлі) — такі відкидаються, як це зробив би
+        findContours на всій сцені. paint(y0, x0, mask), якщо задано,
+        отримує кожен фрагмент, що після гістерезису виявився ребром.
+        """
+        groups = {}
+        for node in self.fragments:
+            groups.setdefault(self._find(node), []).append(node)
+
+        stitched = []
+        for nodes in groups.values():
+            parts = [self.fragments.pop(node) for node in nodes]
+            # Без жодного сильного пікселя вся група — лише слабкі кандидати, не ребро
+            if not any(p[5] for p in parts):
+                continue
+            top = min(p[0] for p in parts)
+            left = min(p[1] for p in parts)
+            bottom = max(p[0] + p[2] for p in parts)
+            right = max(p[1] + p[3] for p in parts)
+            canvas = np.zeros((bottom - top, right - left), dtype=np.uint8)
+            for y, x, h, w, bits, _ in parts:
+                mask = np.unpackbits(bits, count=h * w).reshape(h, w)
+                canvas[y - top:y - top + h, x - left:x - left + w] |= mask
+                if paint is not None:
+                    paint(y, x, mask)
+            contours, _ = cv2.findContours(canvas, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            stitched.extend(contour + np.array([left, top], dtype=contour.dtype) for contour in contours)
+
+        # Обгортати інші контури можуть лише склеєні компоненти: замкнена в тайлі
+        # компонента не може містити те, що перетинає шов
+        enclosing = [(contour, cv2.boundingRect(contour)) for contour in stitched]
+        keep = []
+        for contour in self.contours + stitched:
+            if cv2.contourArea(contour) <= min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            point = tuple(float(v) for v in contour[0, 0])
+            inside = any(
+                outer is not contour and bx <= x and by <= y and x + w <= bx + bw and y + h <= by + bh
+                and cv2.pointPolygonTest(outer, point, False) > 0
+                for outer, (bx, by, bw, bh) in enclosing
+            )
+            if not inside:
+                keep.append(contour)
+        return keep
@@ -0,0 +1,116 @@
+import json
+import struct
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Ділянка: вершини в пікселях сцени (N, 2) int32 (x, y), площа й периметр
+# у пікселях і, якщо задана геоприв'язка, — у одиницях карти
+Field = namedtuple('Field', 'id vertices area_px perimeter_px area perimeter')
+
+# Бінарний формат: заголовок, зміщення (count + 1) int64, вершини (total, 2) int32,
+# площі й периметри count float64 у одиницях карти; усе little-endian
+BINARY_MAGIC = b'FLDV'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sIII6d')
+
+
+def to_world(points, geotransform):
+    """
+    Пікселі (x, y) -> координати карти за геотрансформом у порядку GDAL
+    (x0, ширина пікселя, поворот, y0, поворот, висота пікселя). Беруться центри
+    пікселів, як для точок контуру. Без геотрансформа повертає самі пікселі.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if geotransform is None:
+        return points
+    x0, dx, rx, y0, ry, dy = geotransform
+    col, row = points[:, 0] + 0.5, points[:, 1] + 0.5
+    return np.stack([x0 + col * dx + row * rx, y0 + col * ry + row * dy], axis=1)
+
+
+def describe_fields(polygons, geotransform=None):
+    """Поля з approxPolyDP-багатокутників: вершини, площа й периметр у пікселях і на карті"""
+    fields = []
+    for index, polygon in enumerate(polygons):
+        vertices = polygon.reshape(-1, 2).astype(np.int32)
+        area_px = cv2.contourArea(vertices)
+        perimeter_px = cv2.arcLength(vertices, True)
+        area, perimeter = area_px, perimeter_px
+        if geotransform is not None:
+            # Афінне перетворення множить площі на модуль визначника
+            area = area_px * abs(geotransform[1] * geotransform[5] - geotransform[2] * geotransform[4])
+            ring = to_world(vertices, geotransform)
+            perimeter = float(np.linalg.norm(ring - np.roll(ring, 1, axis=0), axis=1).sum())
+        fields.append(Field(index, vertices, area_px, perimeter_px, area, perimeter))
+    return fields
+
+
+def write_geojson(path, fields, geotransform=None, crs=None):
+    """
+    FeatureCollection із полігоном на кожну ділянку; кільця замкнені й
+    орієнтовані проти годинникової стрілки. Координати лишаються в системі
+    знімка (або в пікселях), без перепроєкції в WGS 84, тож це не RFC 7946.
+    crs — рядок на кшталт 'EPSG:32636'; пишеться членом crs у формі GeoJSON
+    2008, який читають GDAL і QGIS.
+    """
+    features = []
+    for field in fields:
+        ring = to_world(field.vertices, geotransform)
+        x, y = ring[:, 0], ring[:, 1]
+        if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+            ring = ring[::-1]
+        ring = np.vstack([ring, ring[:1]])
+        features.append({
+            'type': 'Feature',
+            'id': field.id,
+            'geometry': {'type': 'Polygon', 'coordinates': [ring.tolist()]},
+            'properties': {
+                'area': field.area, 'perimeter': field.perimeter,
+                'area_px': field.area_px, 'perimeter_px': field.perimeter_px,
+                'vertices': len(field.vertices),
+            },
+        })
+    collection = {'type': 'FeatureCollection', 'features': features}
+    if crs is not None:
+        collection['crs'] = {'type': 'name', 'properties': {'name': crs}}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(collection, f)
+
+
+def write_binary(path, fields, geotransform=None):
+    """
+    Компактний запис для великих сцен: усі вершини одним плоским буфером int32
+    в пікселях, межі ділянок — зміщеннями в ньому. Геотрансформ у заголовку
+    (NaN, якщо його немає), тож координати карти відновлюються через to_world.
+    """
+    offsets = np.zeros(len(fields) + 1, dtype='<i8')
+    offsets[1:] = np.cumsum([len(field.vertices) for field in fields])
+    vertices = (np.concatenate([field.vertices for field in fields]) if fields
+                else np.zeros((0, 2), dtype=np.int32)).astype('<i4')
+    transform = geotransform if geotransform is not None else (np.nan,) * 6
+    with open(path, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(fields), int(offsets[-1]), *transform))
+        f.write(offsets.tobytes())
+        f.write(vertices.tobytes())
+        f.write(np.array([field.area for field in fields], dtype='<f8').tobytes())
+        f.write(np.array([field.perimeter for field in fields], dtype='<f8').tobytes())
+
+
+def read_binary(path):
+    """Зворотне до write_binary: (offsets, vertices, area, perimeter, geotransform або None)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, count, total, *transform = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{path}: не файл ділянок FLDV v{BINARY_VERSION}")
+    position = BINARY_HEADER.size
+    offsets = np.frombuffer(data, '<i8', count + 1, position)
+    position += offsets.nbytes
+    vertices = np.frombuffer(data, '<i4', total * 2, position).reshape(total, 2)
+    position += vertices.nbytes
+    area = np.frombuffer(data, '<f8', count, position)
+    perimeter = np.frombuffer(data, '<f8', count, position + area.nbytes)
+    geotransform = None if np.isnan(transform).all() else tuple(transform)
+    return offsets, vertices, area, perimeter, geotransform